@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -14,11 +16,21 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build services on startup; warm-up runs in the background (see /api/ready)"""
+    await api.services.start()
+    yield
+    await api.services.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="AI Chatbot with RAG",
     description="An AI-powered chatbot with Retrieval-Augmented Generation capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
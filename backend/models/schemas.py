@@ -26,11 +26,21 @@ class ChatResponse(BaseModel):
     sources: Optional[List[dict]] = None
 
 
-class DocumentUpload(BaseModel):
-    """Schema for document upload response"""
+class IngestJob(BaseModel):
+    """Schema for a background document ingestion job"""
+    job_id: str
     filename: str
-    chunks_created: int
-    status: str
+    kind: str
+    status: str  # queued, running, done or failed
+    result: Optional[str] = None  # success or unchanged, once done
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+    chunks_done: int = 0
+    chunks_total: Optional[int] = None
+    chunks_created: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
 
 
 class HealthResponse(BaseModel):
@@ -40,3 +50,34 @@ class HealthResponse(BaseModel):
     documents_count: int
     default_provider: Optional[str] = None
     providers: List[str] = Field(default_factory=list)
+
+
+class ReadinessResponse(BaseModel):
+    """Schema for the readiness probe"""
+    ready: bool
+    status: str
+    detail: Optional[str] = None
+    warmup_seconds: Optional[float] = None
+
+
+class RetrieveBatchRequest(BaseModel):
+    """Schema for batched retrieval requests"""
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    n_results: int = Field(5, ge=1, le=50)
+
+
+class RetrieveBatchResponse(BaseModel):
+    """Schema for batched retrieval responses (one source list per query)"""
+    results: List[List[dict]]
+
+
+class SourceSummary(BaseModel):
+    """Schema for one ingested source"""
+    source: str
+    chunks: int
+
+
+class DocumentList(BaseModel):
+    """Schema for the list of ingested sources"""
+    sources: List[SourceSummary]
+    total_chunks: int
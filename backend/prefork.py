@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Pre-fork launcher: load the embedding model once, then fork web workers and a
+single index writer that share the weights copy-on-write.
+
+    python -m backend.prefork --workers 4 --port 8000
+
+Workers serve queries from their own readers of the index and forward
+uploads and deletes to the writer process, so the Chroma directory and the
+lexical index only ever have one writer. With INDEX_BACKEND=numpy the
+memory-mapped index is opened in the parent as well and shared by all
+workers through the page cache.
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Tokenizer thread pools must not be started before fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import uvicorn  # noqa: E402
+
+from backend.main import app  # noqa: E402
+from backend.routes import api  # noqa: E402
+from backend.services.ingest_jobs import IngestJobStore  # noqa: E402
+from backend.services.session_store import create_session_store  # noqa: E402
+from backend.services.rag_service import RAGService  # noqa: E402
+from backend.services.writer import WriterClient, serve_writer  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _fork(target: Callable[[], None]) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Child: drop the supervisor's signal handlers and never return into its loop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    code = 0
+    try:
+        target()
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else 0
+    except BaseException:  # noqa: BLE001
+        logger.exception("Process %d crashed", os.getpid())
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def _run_worker(rag: RAGService, sock: socket.socket, writer: WriterClient) -> None:
+    rag.writer = writer
+    api.services.preloaded_rag = rag
+    # workers=1: uvicorn would otherwise read WEB_CONCURRENCY, which is ours
+    config = uvicorn.Config(app, workers=1, log_level=os.getenv("LOG_LEVEL", "info").lower())
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    """Preload, fork the writer and ``workers`` web workers, and supervise them"""
+    started = time.perf_counter()
+    rag = RAGService()
+    rag.preload()
+    logger.info("Preloaded %s in %.2fs", rag.embedding_model_name, time.perf_counter() - started)
+    # Create the shared SQLite files and switch them to WAL before the workers race to
+    IngestJobStore.from_env(os.environ).close()
+    create_session_store(os.environ).close()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    writer_dir = tempfile.mkdtemp(prefix="rag-writer-")
+    address = os.path.join(writer_dir, "writer.sock")
+    authkey = os.urandom(32)
+
+    roles: Dict[str, Callable[[], None]] = {"writer": lambda: serve_writer(rag, address, authkey)}
+    for i in range(workers):
+        roles[f"worker-{i}"] = lambda: _run_worker(rag, sock, WriterClient(address, authkey))
+
+    # Keep the preloaded objects out of the collector so forked pages stay shared
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, str] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    children[_fork(roles["writer"])] = "writer"
+    for _ in range(50):
+        if Path(address).exists():
+            break
+        time.sleep(0.1)
+    for role, target in roles.items():
+        if role != "writer":
+            children[_fork(target)] = role
+    logger.info("Serving on http://%s:%d with %d workers and one index writer", host, port, workers)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        role = children.pop(pid, None)
+        if role is None or stopping:
+            continue
+        logger.warning("%s (pid %d) exited with status %d; restarting", role, pid, os.waitstatus_to_exitcode(status))
+        time.sleep(1)
+        children[_fork(roles[role])] = role
+
+    sock.close()
+    shutil.rmtree(writer_dir, ignore_errors=True)
+    logger.info("All workers stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY") or 0) or os.cpu_count() or 1,
+                        help="Web worker processes (default: WEB_CONCURRENCY or the CPU count).")
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("The pre-fork launcher needs os.fork (Linux or macOS).")
+    serve(args.host, args.port, max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from backend.models.schemas import ChatMessage, ChatResponse, DocumentUpload, HealthResponse, UserProfile
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from backend.models.schemas import (
+    ChatMessage,
+    ChatResponse,
+    DocumentList,
+    HealthResponse,
+    IngestJob,
+    ReadinessResponse,
+    RetrieveBatchRequest,
+    RetrieveBatchResponse,
+    UserProfile,
+)
+from backend.services.admission import AdmissionRejected
+from backend.services.extraction import detect_kind
+from backend.services.ingest_jobs import IngestJobManager, IngestQueueFull
 from backend.services.rag_service import RAGService
 from backend.services.chat_service import ChatService
+from backend.services.registry import ServiceRegistry
+from backend.services.session_store import SessionStore
+import json
 import logging
 from typing import Dict
 
@@ -10,59 +27,100 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize services
-rag_service = RAGService()
-chat_service = ChatService()
+# Services are constructed and warmed up by the app lifespan (backend.main)
+services = ServiceRegistry()
 
-# Session storage (in-memory for now)
-user_sessions: Dict[str, Dict] = {}
+def get_rag_service() -> RAGService:
+    """Dependency returning the RAG service once the app has started"""
+    if services.rag is None:
+        raise HTTPException(status_code=503, detail="Service is starting up")
+    return services.rag
+
+
+def get_session_store() -> SessionStore:
+    """Dependency returning the session profile store once the app has started"""
+    if services.sessions is None:
+        raise HTTPException(status_code=503, detail="Service is starting up")
+    return services.sessions
+
+
+def get_ingest_jobs() -> IngestJobManager:
+    """Dependency returning the background ingestion job manager once the app has started"""
+    if services.jobs is None:
+        raise HTTPException(status_code=503, detail="Service is starting up")
+    return services.jobs
+
+
+def get_chat_service() -> ChatService:
+    """Dependency returning the chat service once the app has started"""
+    if services.chat is None:
+        raise HTTPException(status_code=503, detail="Service is starting up")
+    return services.chat
 
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint"""
+async def health_check(chat_service: ChatService = Depends(get_chat_service)):
+    """Health check endpoint (liveness; see /ready for readiness)"""
     return HealthResponse(
         status="healthy",
         rag_enabled=True,
-        documents_count=rag_service.get_document_count(),
+        documents_count=await services.rag.aget_document_count() if services.ready else 0,
         default_provider=chat_service.default_provider,
         providers=chat_service.available_providers(),
     )
 
 
+@router.get("/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Readiness probe: 503 until the model is loaded and the collection is open"""
+    status = services.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return ReadinessResponse(**status)
+
+
 @router.post("/setup-profile")
-async def setup_profile(profile: UserProfile):
+async def setup_profile(profile: UserProfile, sessions: SessionStore = Depends(get_session_store)):
     """Store user profile for personalized responses"""
-    user_sessions[profile.session_id] = {
+    await sessions.aset(profile.session_id, {
         "grade_levels": profile.grade_levels,
         "scenario": profile.scenario
-    }
+    })
     logger.info("Profile set up for session %s", profile.session_id)
     return {"status": "success", "session_id": profile.session_id}
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage):
+async def chat(
+    message: ChatMessage,
+    rag_service: RAGService = Depends(get_rag_service),
+    chat_service: ChatService = Depends(get_chat_service),
+    sessions: SessionStore = Depends(get_session_store),
+):
     """Chat endpoint with mandatory RAG and context awareness"""
     try:
         # Always retrieve RAG context (forced)
-        sources = rag_service.query(message.message, n_results=5)
+        sources = await rag_service.aquery(message.message, n_results=5)
         logger.info("Retrieved %d sources for query", len(sources))
 
         # Get user profile from session
-        user_profile = user_sessions.get(message.session_id, {})
+        user_profile = await sessions.aget(message.session_id) or {}
 
         # Get language preference (default to English)
         language = message.language or 'en'
         logger.info("Language preference: %s", language)
 
-        # Generate response (always using xai/Grok-4)
-        response_text, provider_used = chat_service.generate_response(
+        # Query embedding keys the semantic answer cache (already cached by query())
+        query_embedding = await rag_service.aembed_query(message.message) if chat_service.semantic_cache else None
+
+        # Generate response (xai/Grok-4 preferred; the router fails over when it is down or slow)
+        response_text, provider_used = await chat_service.generate_response(
             user_message=message.message,
             context=sources,
-            provider="xai",  # Force Grok-4
+            provider=message.provider or "xai",
             user_profile=user_profile,
             language=language,  # Pass language to chat service
+            query_embedding=query_embedding,
         )
 
         return ChatResponse(
@@ -71,51 +129,148 @@ async def chat(message: ChatMessage):
             sources=sources  # Always return sources
         )
 
+    except AdmissionRejected as e:
+        raise _too_busy(str(e), e.retry_after) from e
     except Exception as e:  # noqa: BLE001
         logger.error("Error in chat endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
-@router.post("/upload", response_model=DocumentUpload)
-async def upload_document(file: UploadFile = File(...)):
-    """Upload a document to the RAG system"""
+def _too_busy(detail: str, retry_after: int) -> HTTPException:
+    """429 response telling the client when to retry"""
+    logger.warning("Rejected chat request: %s", detail)
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+def _sse(event: str, data: Dict) -> str:
+    """Encode a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    message: ChatMessage,
+    rag_service: RAGService = Depends(get_rag_service),
+    chat_service: ChatService = Depends(get_chat_service),
+    sessions: SessionStore = Depends(get_session_store),
+):
+    """Stream a chat response as server-sent events: sources first, then HTML fragments"""
     try:
-        # Read file content
-        content = await file.read()
-
-        # Handle different file types
-        if file.filename.endswith('.txt'):
-            text = content.decode('utf-8')
-        elif file.filename.endswith('.pdf'):
-            from pypdf import PdfReader  # lazy import for PDFs
-            from io import BytesIO
-            pdf_file = BytesIO(content)
-            reader = PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += (page.extract_text() or "") + "\n"
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Please upload .txt or .pdf files.")
-
-        # Add to RAG system
-        chunks_created = rag_service.add_document(text, file.filename)
-
-        return DocumentUpload(
-            filename=file.filename,
-            chunks_created=chunks_created,
-            status="success"
-        )
+        sources = await rag_service.aquery(message.message, n_results=5)
+        logger.info("Retrieved %d sources for streamed query", len(sources))
+        query_embedding = await rag_service.aembed_query(message.message) if chat_service.semantic_cache else None
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error in chat stream endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    user_profile = await sessions.aget(message.session_id) or {}
+    language = message.language or 'en'
+
+    events = chat_service.stream_response(
+        user_message=message.message,
+        context=sources,
+        provider=message.provider or "xai",  # Grok-4 preferred
+        user_profile=user_profile,
+        language=language,
+        query_embedding=query_embedding,
+    )
+    # Wait for admission (the first event) so a full queue is still a plain 429
+    first_event = await events.__anext__()
+    if first_event.get("status") == 429:
+        await events.aclose()
+        raise _too_busy(first_event["detail"], first_event["retry_after"])
+
+    async def event_stream():
+        yield _sse("sources", {"sources": sources})
+        yield _sse(first_event.pop("event"), first_event)
+        async for event in events:
+            yield _sse(event.pop("event"), event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@router.post("/retrieve/batch", response_model=RetrieveBatchResponse)
+async def retrieve_batch(request: RetrieveBatchRequest, rag_service: RAGService = Depends(get_rag_service)):
+    """Retrieve sources for many queries with one batched encode and vector search"""
+    try:
+        results = await rag_service.aquery_many(request.queries, n_results=request.n_results)
+        return RetrieveBatchResponse(results=results)
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error in batch retrieval: %s", e)
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.post("/upload", response_model=IngestJob, status_code=202)
+async def upload_document(file: UploadFile = File(...), jobs: IngestJobManager = Depends(get_ingest_jobs)):
+    """Queue a document for ingestion; poll /api/jobs/{job_id} for progress"""
+    kind = detect_kind(file.filename or "")
+    if kind not in ("txt", "pdf"):
+        raise HTTPException(status_code=400, detail="Unsupported file type. Please upload .txt or .pdf files.")
+
+    try:
+        # Spooled to disk and processed in the background (unchanged re-uploads are skipped)
+        return await jobs.submit(file.file, file.filename, kind)
+    except IngestQueueFull as e:
+        raise _too_busy(str(e), e.retry_after) from e
     except Exception as e:  # noqa: BLE001
         logger.error("Error uploading document: %s", e)
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.get("/jobs/{job_id}", response_model=IngestJob)
+async def get_job(job_id: str, jobs: IngestJobManager = Depends(get_ingest_jobs)):
+    """Status and progress (pages extracted, chunks embedded) of an ingestion job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.put("/documents/{source:path}", response_model=IngestJob, status_code=202)
+async def replace_document(source: str, file: UploadFile = File(...), jobs: IngestJobManager = Depends(get_ingest_jobs)):
+    """Queue a new version of one source; only its changed chunks are re-embedded"""
+    kind = detect_kind(file.filename or "") or detect_kind(source)
+    if kind not in ("txt", "pdf"):
+        raise HTTPException(status_code=400, detail="Unsupported file type. Please upload .txt or .pdf files.")
+
+    try:
+        return await jobs.submit(file.file, source, kind)
+    except IngestQueueFull as e:
+        raise _too_busy(str(e), e.retry_after) from e
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error replacing %s: %s", source, e)
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.delete("/documents/{source:path}")
+async def delete_document(source: str, rag_service: RAGService = Depends(get_rag_service)):
+    """Remove one source from the RAG system, leaving the rest of the collection in place"""
+    try:
+        removed = await rag_service.adelete_source(source)
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error deleting %s: %s", source, e)
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if not removed:
+        raise HTTPException(status_code=404, detail="Source not found")
+    return {"status": "success", "source": source, "chunks_removed": removed}
+
+
+@router.get("/documents", response_model=DocumentList)
+async def list_documents(rag_service: RAGService = Depends(get_rag_service)):
+    """List the ingested sources with their chunk counts"""
+    sources = await rag_service.alist_sources()
+    return DocumentList(sources=sources, total_chunks=sum(item["chunks"] for item in sources))
+
+
 @router.delete("/documents")
-async def clear_documents():
+async def clear_documents(rag_service: RAGService = Depends(get_rag_service)):
     """Clear all documents from the RAG system"""
     try:
-        rag_service.clear_collection()
+        await rag_service.aclear_collection()
         return {"status": "success", "message": "All documents cleared"}
     except Exception as e:  # noqa: BLE001
         logger.error("Error clearing documents: %s", e)
@@ -123,6 +278,30 @@ async def clear_documents():
 
 
 @router.get("/documents/count")
-async def get_document_count():
+async def get_document_count(rag_service: RAGService = Depends(get_rag_service)):
     """Get the number of document chunks in the system"""
-    return {"count": rag_service.get_document_count()}
+    if not services.ready:
+        raise HTTPException(status_code=503, detail="Service is starting up")
+    return {"count": await rag_service.aget_document_count()}
+
+
+@router.get("/metrics")
+async def get_metrics(
+    rag_service: RAGService = Depends(get_rag_service),
+    chat_service: ChatService = Depends(get_chat_service),
+    sessions: SessionStore = Depends(get_session_store),
+    jobs: IngestJobManager = Depends(get_ingest_jobs),
+):
+    """Runtime counters for capacity planning"""
+    return {
+        "rag_cache": rag_service.cache_stats(),
+        "index": await rag_service.aindex_stats() if services.ready else None,
+        "retrieval_timings": rag_service.timing_stats(),
+        "context_packer": chat_service.context_packer.stats(),
+        "prompt_cache": chat_service.prompt_cache_stats(),
+        "providers": chat_service.router.stats(),
+        "admission": chat_service.admission.stats(),
+        "sessions": sessions.stats(),
+        "ingest_jobs": jobs.stats(),
+        "semantic_cache": chat_service.semantic_cache.stats() if chat_service.semantic_cache else None,
+    }
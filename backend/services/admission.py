@@ -0,0 +1,147 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List
+
+
+class AdmissionRejected(Exception):
+    """A provider's queue is full (or the queue wait ran out); retry after ``retry_after`` seconds"""
+
+    def __init__(self, provider: str, reason: str, retry_after: int):
+        super().__init__(f"{provider} is at capacity ({reason}); retry in {retry_after}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ProviderLimiter:
+    """Caps in-flight calls to one provider; extra callers wait in a bounded FIFO queue.
+
+    A caller is rejected immediately when ``max_queue`` callers are already
+    waiting, and after ``max_wait`` seconds if no slot frees up. Released
+    slots are handed straight to the oldest waiter.
+    """
+
+    def __init__(self, provider: str, max_concurrency: int = 8, max_queue: int = 32, max_wait: float = 10.0, window: int = 500):
+        self.provider = provider
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._hold_seconds = 1.0  # moving average of how long a slot is held
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of the block"""
+        await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.perf_counter() - started)
+            self.release()
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self._admit(0.0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.provider, "queue full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._forget(waiter)
+            self.timed_out += 1
+            raise AdmissionRejected(self.provider, "queue wait exceeded", self.retry_after()) from None
+        except asyncio.CancelledError:
+            self._forget(waiter)
+            raise
+        self._admit(time.perf_counter() - started)
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up: pass it on
+            self.release()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves to the waiter; in_flight is unchanged
+                return
+        self.in_flight -= 1
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        self._waits.append(waited)
+
+    def retry_after(self) -> int:
+        """Seconds until a new caller would likely get a slot"""
+        backlog = (len(self._waiters) + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self._hold_seconds))
+
+    def _wait_percentile(self, percentile: float) -> float:
+        waits: List[float] = sorted(self._waits)
+        if not waits:
+            return 0.0
+        return waits[min(len(waits) - 1, int(round(percentile / 100.0 * (len(waits) - 1))))]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_p50_ms": round(self._wait_percentile(50) * 1000.0, 1),
+            "wait_p95_ms": round(self._wait_percentile(95) * 1000.0, 1),
+        }
+
+
+class AdmissionController:
+    """One ProviderLimiter per LLM provider"""
+
+    def __init__(self, limiters: Dict[str, ProviderLimiter]):
+        self.limiters = limiters
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str], providers: List[str]) -> "AdmissionController":
+        """Read ``<PROVIDER>_MAX_CONCURRENCY`` etc., falling back to ``LLM_MAX_CONCURRENCY`` etc."""
+
+        def setting(provider: str, name: str, default: str) -> str:
+            return env.get(f"{provider.upper()}_{name}") or env.get(f"LLM_{name}", default)
+
+        return cls({
+            provider: ProviderLimiter(
+                provider,
+                max_concurrency=int(setting(provider, "MAX_CONCURRENCY", "8")),
+                max_queue=int(setting(provider, "MAX_QUEUE", "32")),
+                max_wait=float(setting(provider, "MAX_QUEUE_WAIT", "10")),
+            )
+            for provider in providers
+        })
+
+    def slot(self, provider: str):
+        """Async context manager holding a slot for ``provider``"""
+        return self.limiters[provider].slot()
+
+    def stats(self) -> Dict:
+        return {provider: limiter.stats() for provider, limiter in self.limiters.items()}
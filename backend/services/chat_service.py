@@ -1,13 +1,74 @@
+import asyncio
+import functools
 import os
 import logging
-from typing import Dict, List, Optional, Tuple
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from backend.services.admission import AdmissionController, AdmissionRejected
+from backend.services.context_packer import ContextPacker
+from backend.services.http_transport import TransportSettings, build_http_client, warm_up_connections
+from backend.services.provider_router import ProviderFailed, ProviderRouter
+from backend.services.semantic_cache import SemanticCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+_LANGUAGE_INSTRUCTIONS = {
+    "es": "\n\nIMPORTANT: Respond entirely in Spanish. Translate all content, strategies, and advice into Spanish.",
+}
+
+
+def _supported_language(language: Optional[str]) -> str:
+    """Map a client-supplied language to one with its own instructions, defaulting to English"""
+    language = (language or "en").lower()
+    return language if language in _LANGUAGE_INSTRUCTIONS else "en"
+
+
+@functools.lru_cache(maxsize=len(_LANGUAGE_INSTRUCTIONS) + 1)
+def _static_instructions(language: str) -> str:
+    """The request-independent part of the system prompt, built once per language"""
+    return """You are an RRC (Recognize, Respond, Connect) Support Coach - an expert in the RRC course content specializing in:
+- Supporting California K-12 educational professionals with trauma-informed practices
+- Providing evidence-based strategies from the RRC course and research literature
+- Delivering actionable guidance grounded in California education guidelines and regulations
+
+RESPONSE FORMAT REQUIREMENTS:
+1. Keep responses between 300-400 words maximum
+2. Use HTML formatting ONLY - NEVER use markdown (**, ##, etc.)
+3. Use <strong>text</strong> for emphasis and important terms
+4. Use <ul> and <li> tags for bullet lists - each bullet on a separate line
+5. Break text into short paragraphs using <p> tags (2-3 sentences max)
+6. Be warm, supportive, and direct in tone
+
+CONTENT STRUCTURE (MANDATORY):
+Every response must include:
+- Brief introduction addressing the question/scenario
+- 1-2 specific, actionable strategies based on RRC course content
+- Reference to relevant California guidelines or regulations when applicable
+- Do NOT include source citations in the main response (sources will be appended separately)
+
+GROUNDING RULES:
+- Base all advice on the RRC course content (primary source of truth)
+- Support with research literature and references when available
+- Minimize hallucinations - stay within knowledge base boundaries
+- If information is not in the knowledge base, acknowledge limitations
+- Never make up statistics or research findings
+
+HTML FORMATTING EXAMPLE:
+<p><strong>Understanding the Situation:</strong> When a student shows signs of trauma...</p>
+<p>Here are evidence-based strategies you can use:</p>
+<ul>
+<li>Strategy 1: Create a predictable classroom routine...</li>
+<li>Strategy 2: Use trauma-sensitive language...</li>
+</ul>""" + _LANGUAGE_INSTRUCTIONS.get(language, "")
+
+
 class ChatService:
     """Service for handling AI chat interactions with pluggable providers."""
 
@@ -17,7 +78,7 @@ class ChatService:
         openai_key = os.getenv("OPENAI_API_KEY")
         if openai_key:
             self.providers["openai"] = {
-                "client": OpenAI(api_key=openai_key),
+                **self._client_config("openai", api_key=openai_key, base_url="https://api.openai.com/v1"),
                 "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
                 "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "1000")),
             }
@@ -28,7 +89,7 @@ class ChatService:
         if xai_key:
             base_url = os.getenv("XAI_BASE_URL", "https://api.x.ai/v1")
             self.providers["xai"] = {
-                "client": OpenAI(api_key=xai_key, base_url=base_url),
+                **self._client_config("xai", api_key=xai_key, base_url=base_url),
                 "model": os.getenv("XAI_MODEL", "grok-beta"),
                 "max_tokens": int(os.getenv("XAI_MAX_TOKENS", "1000")),
             }
@@ -44,166 +105,522 @@ class ChatService:
         if not self.default_provider:
             logger.warning("No LLM providers configured. Chat functionality will be limited.")
 
+        # Failover, circuit breaking and optional hedging across providers
+        self.router = ProviderRouter.from_env(os.environ, list(self.providers))
+
+        # Per-provider concurrency limits with a bounded wait queue
+        self.admission = AdmissionController.from_env(os.environ, list(self.providers))
+
+        # Optional answer cache for paraphrased questions (SEMANTIC_CACHE_ENABLED)
+        self.semantic_cache = SemanticCache.from_env(os.environ)
+        if self.semantic_cache:
+            logger.info("Semantic answer cache enabled (threshold %.2f)", self.semantic_cache.threshold)
+
+        # Prompt tokens and provider-side cached prompt tokens per provider
+        self.prompt_usage: Dict[str, Dict[str, int]] = {}
+        self._usage_lock = threading.Lock()
+
+        # Merges, deduplicates and budgets retrieved chunks before the prompt
+        self.context_packer = ContextPacker.from_env(os.environ)
+
+    @staticmethod
+    def _client_config(provider_name: str, api_key: str, base_url: str) -> Dict:
+        """A provider client on its own tuned connection pool (see TransportSettings)"""
+        transport = TransportSettings.from_env(os.environ, provider_name)
+        http_client = build_http_client(transport)
+        return {
+            "client": AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_client,
+                max_retries=transport.max_retries,  # jittered backoff on 408/409/429/5xx
+            ),
+            "http_client": http_client,
+            "base_url": base_url,
+            "transport": transport,
+        }
+
+    async def awarm_up(self) -> None:
+        """Open provider connections ahead of the first chat request"""
+        for provider_name, config in self.providers.items():
+            opened = await warm_up_connections(
+                config["http_client"], config["base_url"], config["transport"].warmup_connections
+            )
+            if opened:
+                logger.info("Opened %d warm connection(s) to %s", opened, provider_name)
+
     def available_providers(self) -> List[str]:
         """Return a sorted list of configured providers."""
         return sorted(self.providers.keys())
 
-    def _build_system_message(self, context: Optional[List[Dict]], user_profile: Optional[Dict] = None, language: str = "en") -> str:
-        grade_context = ""
-        role_context = ""
-
-        if user_profile:
-            grade_context = f"Grade Level: {user_profile.get('grade_levels', 'K-12')}"
-            role_context = f"Professional Role: {user_profile.get('role', 'Education professional')}"
-
-        # Language instruction
-        language_instruction = ""
-        if language == "es":
-            language_instruction = "\n\nIMPORTANT: Respond entirely in Spanish. Translate all content, strategies, and advice into Spanish."
-
-        base_message = f"""You are an RRC (Recognize, Respond, Connect) Support Coach - an expert in the RRC course content specializing in:
-- Supporting California K-12 educational professionals with trauma-informed practices
-- Providing evidence-based strategies from the RRC course and research literature
-- Delivering actionable guidance grounded in California education guidelines and regulations
-
-{grade_context}
-{role_context}
+    async def aclose(self):
+        """Close the HTTP connections held by the provider clients."""
+        for config in self.providers.values():
+            await config["client"].close()
+        if self.semantic_cache:
+            self.semantic_cache.close()
 
-RESPONSE FORMAT REQUIREMENTS:
-1. Keep responses between 300-400 words maximum
-2. Use HTML formatting ONLY - NEVER use markdown (**, ##, etc.)
-3. Use <strong>text</strong> for emphasis and important terms
-4. Use <ul> and <li> tags for bullet lists - each bullet on a separate line
-5. Break text into short paragraphs using <p> tags (2-3 sentences max)
-6. Be warm, supportive, and direct in tone
+    def _cache_lookup(
+        self,
+        query_embedding: Optional[List[float]],
+        context: Optional[List[Dict]],
+        user_profile: Optional[Dict],
+        language: str,
+    ) -> Optional[Tuple[str, str]]:
+        if not self.semantic_cache or query_embedding is None:
+            return None
+        grade_level = (user_profile or {}).get("grade_levels", "")
+        return self.semantic_cache.lookup(query_embedding, language, grade_level, context)
+
+    async def _cache_store(
+        self,
+        query_embedding: Optional[List[float]],
+        context: Optional[List[Dict]],
+        user_profile: Optional[Dict],
+        language: str,
+        response: str,
+        provider_name: str,
+    ) -> None:
+        if not self.semantic_cache or query_embedding is None:
+            return
+        grade_level = (user_profile or {}).get("grade_levels", "")
+        await asyncio.get_running_loop().run_in_executor(
+            None,
+            self.semantic_cache.store,
+            query_embedding,
+            language,
+            grade_level,
+            context,
+            response,
+            provider_name,
+        )
 
-CONTENT STRUCTURE (MANDATORY):
-Every response must include:
-- Brief introduction addressing the question/scenario
-- 1-2 specific, actionable strategies based on RRC course content
-- Reference to relevant California guidelines or regulations when applicable
-- Do NOT include source citations in the main response (sources will be appended separately)
+    def _build_system_message(self, context: Optional[List[Dict]], user_profile: Optional[Dict] = None, language: str = "en") -> str:
+        """Static instructions first (byte-identical per language), then the per-request parts.
 
-GROUNDING RULES:
-- Base all advice on the RRC course content (primary source of truth)
-- Support with research literature and references when available
-- Minimize hallucinations - stay within knowledge base boundaries
-- If information is not in the knowledge base, acknowledge limitations
-- Never make up statistics or research findings
+        Keeping the variable profile and knowledge-base context after an
+        unchanging prefix lets providers reuse their prompt prefix cache.
+        """
+        parts = [_static_instructions(_supported_language(language))]
 
-HTML FORMATTING EXAMPLE:
-<p><strong>Understanding the Situation:</strong> When a student shows signs of trauma...</p>
-<p>Here are evidence-based strategies you can use:</p>
-<ul>
-<li>Strategy 1: Create a predictable classroom routine...</li>
-<li>Strategy 2: Use trauma-sensitive language...</li>
-</ul>{language_instruction}"""
+        if user_profile:
+            parts.append(
+                f"Grade Level: {user_profile.get('grade_levels', 'K-12')}\n"
+                f"Professional Role: {user_profile.get('role', 'Education professional')}"
+            )
 
         if context:
             context_text = "\n\n".join(
                 [f"[Source: {item['source']}]\n{item['text']}" for item in context]
             )
-            base_message += f"\n\nKnowledge Base Context:\n{context_text}"
+            parts.append(f"Knowledge Base Context:\n{context_text}")
 
-        return base_message
+        return "\n\n".join(parts)
 
-    def generate_response(
-        self,
-        user_message: str,
-        context: Optional[List[Dict]] = None,
-        provider: Optional[str] = None,
-        user_profile: Optional[Dict] = None,
-        language: str = "en",
-    ) -> Tuple[str, str]:
-        """Generate a chat response and return the provider used."""
+    def _record_usage(self, usage, provider_name: str) -> None:
+        """Count prompt and provider-cached prompt tokens from a usage object"""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        if isinstance(details, dict):
+            cached = details.get("cached_tokens") or 0
+        else:
+            cached = getattr(details, "cached_tokens", 0) or 0
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        with self._usage_lock:
+            stats = self.prompt_usage.setdefault(provider_name, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            stats["requests"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["cached_tokens"] += cached
+        logger.info("%s prompt tokens: %d (%d cached)", provider_name, prompt_tokens, cached)
+
+    def prompt_cache_stats(self) -> Dict:
+        """Prompt tokens and provider prefix-cache hits per provider"""
+        with self._usage_lock:
+            return {
+                provider: dict(
+                    stats,
+                    cached_ratio=round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0,
+                )
+                for provider, stats in self.prompt_usage.items()
+            }
 
+    def _resolve_provider(
+        self, provider: Optional[str]
+    ) -> Tuple[Optional[List[str]], Set[str], Optional[str], str]:
+        """Providers to try for a request and the half-open trials claimed for it,
+        or an error message and the provider to report"""
         if not self.providers:
             return (
+                None,
+                set(),
                 "Error: no language model providers are configured. Please supply API keys in the .env file.",
                 "unavailable",
             )
 
         provider_name = (provider or self.default_provider or "").lower()
-        if provider_name not in self.providers:
+        if provider_name not in self.providers and not self.router.failover:
             available = ", ".join(sorted(self.providers.keys()))
             return (
+                None,
+                set(),
                 f"Error: provider '{provider_name or 'unknown'}' is not available. Available providers: {available}.",
                 provider_name or "unknown",
             )
+        candidates, trials = self.router.candidates(provider_name)
+        if not candidates:
+            return (
+                None,
+                set(),
+                "Error: the language model providers are temporarily unavailable. Please try again shortly.",
+                provider_name or "unavailable",
+            )
+        return candidates, trials, None, provider_name
 
+    async def _complete(self, provider_name: str, messages: List[Dict], trial: bool = False) -> str:
+        """One non-streaming completion within the provider's concurrency limit, timed by the router"""
         config = self.providers[provider_name]
+        recorded = False
+        try:
+            async with self.admission.slot(provider_name):
+                started = time.perf_counter()
+                try:
+                    response = await config["client"].chat.completions.create(
+                        model=config["model"],
+                        messages=messages,
+                        max_tokens=600,  # ~400 words for 300-400 word responses
+                        temperature=0.1,  # Low temperature for accuracy and minimal hallucination
+                    )
+                except Exception:
+                    recorded = True
+                    self.router.record(provider_name, time.perf_counter() - started, ok=False)
+                    raise
+                recorded = True
+                self.router.record(provider_name, time.perf_counter() - started, ok=True)
+        finally:
+            if trial and not recorded:
+                # Not admitted or cancelled: let another request take the trial
+                self.router.release(provider_name)
+        self._record_usage(getattr(response, "usage", None), provider_name)
+        return response.choices[0].message.content
+
+    async def _route_completion(self, candidates: List[str], trials: Set[str], messages: List[Dict]) -> Tuple[str, str]:
+        """Try providers in order, hedging the first once it runs past its p95.
+
+        Returns the content and the provider that answered. If every provider
+        fails, raises AdmissionRejected when the last one refused the request
+        and ProviderFailed otherwise.
+        """
+        remaining = list(candidates)
+        pending: Dict[asyncio.Task, str] = {}
+        last_error: Optional[Exception] = None
+        last_provider = candidates[0]
+        hedged = False
+
+        def launch() -> None:
+            name = remaining.pop(0)
+            pending[asyncio.create_task(self._complete(name, messages, trial=name in trials))] = name
+
+        launch()
+        hedge_delay = self.router.hedge_delay(candidates[0]) if remaining else None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                hedge_delay = None
+                if not done:
+                    # The first provider is slower than its p95: race the next one
+                    logger.info("Hedging %s with %s", candidates[0], remaining[0])
+                    self.router.count("hedges")
+                    hedged = True
+                    launch()
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        content = task.result()
+                    except AdmissionRejected as exc:
+                        logger.warning("Request not admitted by %s: %s", name, exc)
+                        last_error, last_provider = exc, name
+                        continue
+                    except Exception as exc:  # noqa: BLE001
+                        logger.error("Error generating response with %s: %s", name, exc)
+                        last_error, last_provider = exc, name
+                        continue
+                    if name != candidates[0]:
+                        self.router.count("hedge_wins" if hedged else "failovers")
+                    return content, name
+                if not pending and remaining:
+                    logger.info("Failing over to %s", remaining[0])
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            for name in remaining:
+                if name in trials:
+                    self.router.release(name)
+        if isinstance(last_error, AdmissionRejected):
+            raise last_error
+        raise ProviderFailed(last_provider, last_error) from last_error
+
+    async def generate_response(
+        self,
+        user_message: str,
+        context: Optional[List[Dict]] = None,
+        provider: Optional[str] = None,
+        user_profile: Optional[Dict] = None,
+        language: str = "en",
+        query_embedding: Optional[List[float]] = None,
+    ) -> Tuple[str, str]:
+        """Generate a chat response and return the provider that answered.
+
+        ``provider`` is preferred; the router fails over to (or hedges with)
+        the other configured providers when it is failing or slow. When the
+        semantic cache is enabled and ``query_embedding`` is given, a cached
+        answer for a close paraphrase with the same language, grade level and
+        retrieved sources is returned instead of calling a model.
+
+        Raises AdmissionRejected when every candidate provider is at capacity.
+        """
+        language = _supported_language(language)
+        context = self.context_packer.pack(context)
+        cached = self._cache_lookup(query_embedding, context, user_profile, language)
+        if cached:
+            return cached
+
+        candidates, trials, error, provider_name = self._resolve_provider(provider)
+        if error:
+            return error, provider_name
+
         system_message = self._build_system_message(context, user_profile, language)
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message},
+        ]
 
         try:
-            response = config["client"].chat.completions.create(
-                model=config["model"],
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message},
-                ],
-                max_tokens=600,  # ~400 words for 300-400 word responses
-                temperature=0.1,  # Low temperature for accuracy and minimal hallucination
-            )
-            content = response.choices[0].message.content
+            content, provider_name = await self._route_completion(candidates, trials, messages)
+        except ProviderFailed as exc:
+            return (f"Error generating response: {exc}", exc.provider)
+
+        # Format as HTML
+        content = self._format_as_html(content)
+
+        await self._cache_store(query_embedding, context, user_profile, language, content, provider_name)
+        return content, provider_name
+
+    async def stream_response(
+        self,
+        user_message: str,
+        context: Optional[List[Dict]] = None,
+        provider: Optional[str] = None,
+        user_profile: Optional[Dict] = None,
+        language: str = "en",
+        query_embedding: Optional[List[float]] = None,
+    ) -> AsyncIterator[Dict]:
+        """Stream a chat response as HTML fragments.
+
+        Yields ``{"event": "token", "html": ...}`` events as formatted output
+        becomes available, then a final ``{"event": "done", "provider": ...}``
+        (or ``{"event": "error", ...}`` if generation fails). Each attempt on
+        a provider starts with ``{"event": "start", "provider": ...}`` once it
+        holds a concurrency slot; a provider that fails before its first token
+        is failed over like generate_response(). If no provider admits the
+        request the only event is an error with ``status`` 429 and
+        ``retry_after``.
+        """
+        language = _supported_language(language)
+        context = self.context_packer.pack(context)
+        cached = self._cache_lookup(query_embedding, context, user_profile, language)
+        if cached:
+            yield {"event": "token", "html": cached[0]}
+            yield {"event": "done", "provider": cached[1]}
+            return
+
+        candidates, trials, error, provider_name = self._resolve_provider(provider)
+        if error:
+            yield {"event": "error", "detail": error, "provider": provider_name}
+            return
 
-            # Format as HTML
-            content = self._format_as_html(content)
+        system_message = self._build_system_message(context, user_profile, language)
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message},
+        ]
 
-            return content, provider_name
-        except Exception as exc:  # noqa: BLE001
-            logger.error("Error generating response with %s: %s", provider_name, exc)
-            return (f"Error generating response: {exc}", provider_name)
+        attempted: Set[str] = set()
+        try:
+            for attempt, provider_name in enumerate(candidates):
+                config = self.providers[provider_name]
+                attempted.add(provider_name)
+                trial = provider_name in trials
+                recorded = False
+                formatter = StreamingHTMLFormatter()
+                fragments: List[str] = []
+                if attempt:
+                    logger.info("Failing over stream to %s", provider_name)
+                    self.router.count("failovers")
+                try:
+                    async with self.admission.slot(provider_name):
+                        yield {"event": "start", "provider": provider_name}
+                        started = time.perf_counter()
+                        try:
+                            stream = await config["client"].chat.completions.create(
+                                model=config["model"],
+                                messages=messages,
+                                max_tokens=600,
+                                temperature=0.1,
+                                stream=True,
+                                # Final chunk carries token usage (including cached prompt tokens)
+                                extra_body={"stream_options": {"include_usage": True}},
+                            )
+                            async for chunk in stream:
+                                usage = getattr(chunk, "usage", None)
+                                if usage is not None:
+                                    self._record_usage(usage, provider_name)
+                                if not chunk.choices:
+                                    continue
+                                delta = chunk.choices[0].delta.content
+                                if not delta:
+                                    continue
+                                html = formatter.feed(delta)
+                                if html:
+                                    fragments.append(html)
+                                    yield {"event": "token", "html": html}
+
+                            html = formatter.flush()
+                            if html:
+                                fragments.append(html)
+                                yield {"event": "token", "html": html}
+                            recorded = True
+                            self.router.record(provider_name, time.perf_counter() - started, ok=True)
+                            await self._cache_store(query_embedding, context, user_profile, language, "".join(fragments).strip(), provider_name)
+                            yield {"event": "done", "provider": provider_name}
+                            return
+                        except Exception as exc:  # noqa: BLE001
+                            recorded = True
+                            self.router.record(provider_name, time.perf_counter() - started, ok=False)
+                            logger.error("Error streaming response with %s: %s", provider_name, exc)
+                            if fragments or attempt == len(candidates) - 1:
+                                # Tokens already reached the client, or nobody is left to try
+                                yield {"event": "error", "detail": f"Error generating response: {exc}", "provider": provider_name}
+                                return
+                except AdmissionRejected as exc:
+                    logger.warning("Stream not admitted by %s: %s", provider_name, exc)
+                    if attempt == len(candidates) - 1:
+                        yield {
+                            "event": "error",
+                            "detail": str(exc),
+                            "provider": provider_name,
+                            "status": 429,
+                            "retry_after": exc.retry_after,
+                        }
+                        return
+                finally:
+                    if trial and not recorded:
+                        # Not admitted, or the client went away: let another request take the trial
+                        self.router.release(provider_name)
+        finally:
+            for name in trials - attempted:
+                # Trials claimed for failover targets that were never reached
+                self.router.release(name)
 
     def _format_as_html(self, text: str) -> str:
         """Convert AI response to proper HTML formatting."""
-        import re
-
         # If already contains HTML tags, return as-is
         if '<p>' in text or '<ul>' in text:
             return text.strip()
 
+        formatter = StreamingHTMLFormatter(markdown=True)
+        return (formatter.feed(text) + formatter.flush()).strip()
+
+
+class StreamingHTMLFormatter:
+    """Incrementally convert streamed model output into well-formed HTML fragments.
+
+    Markdown is buffered until each line completes, then emitted as a ``<p>``
+    or ``<li>`` fragment (opening and closing ``<ul>`` as lists start and end).
+    Output that is already HTML is passed through as it arrives.
+    """
+
+    _HTML_HINT = re.compile(r'<(p|ul|ol|li|strong|h\d)\b', re.IGNORECASE)
+    _BULLET = re.compile(r'^[-*+•]\s+')
+    _NUMBERED = re.compile(r'^\d+\.\s+')
+
+    def __init__(self, markdown: Optional[bool] = None):
+        # None means "decide from the first complete line".
+        self._markdown = markdown
+        self._buffer = ""
+        self._in_list = False
+
+    def feed(self, text: str) -> str:
+        """Consume streamed text and return any HTML that is ready to emit."""
+        if self._markdown is False:
+            return text
+
+        self._buffer += text
+        if self._markdown is None:
+            if '<p>' in self._buffer or '<ul>' in self._buffer:
+                return self._switch_to_passthrough()
+            if '\n' not in self._buffer:
+                return ""
+            first_line = next((line for line in self._buffer.split('\n')[:-1] if line.strip()), None)
+            if first_line is None:
+                return ""
+            if self._HTML_HINT.search(first_line):
+                return self._switch_to_passthrough()
+            self._markdown = True
+
+        lines = self._buffer.split('\n')
+        self._buffer = lines.pop()
+        return "".join(self._format_line(line) for line in lines)
+
+    def flush(self) -> str:
+        """Emit whatever is still buffered and close any open list."""
+        if self._markdown is False:
+            return ""
+        if self._markdown is None and self._HTML_HINT.search(self._buffer):
+            return self._switch_to_passthrough()
+
+        output = self._format_line(self._buffer) if self._buffer else ""
+        self._buffer = ""
+        if self._in_list:
+            output += '</ul>\n'
+            self._in_list = False
+        return output
+
+    def _switch_to_passthrough(self) -> str:
+        self._markdown = False
+        output, self._buffer = self._buffer, ""
+        return output
+
+    def _format_line(self, line: str) -> str:
         # Convert markdown bold to HTML strong
-        text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)
-        text = re.sub(r'__(.+?)__', r'<strong>\1</strong>', text)
+        line = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', line)
+        line = re.sub(r'__(.+?)__', r'<strong>\1</strong>', line)
 
         # Remove markdown headers (##, ###, etc.) and make them strong
-        text = re.sub(r'^#+\s+(.+)$', r'<strong>\1</strong>', text, flags=re.MULTILINE)
-
-        # Convert bullet points to HTML list
-        lines = text.split('\n')
-        formatted_lines = []
-        in_list = False
-
-        for line in lines:
-            stripped = line.strip()
-
-            # Check if line is a bullet point
-            if re.match(r'^[-*+•]\s+', stripped):
-                if not in_list:
-                    formatted_lines.append('<ul>')
-                    in_list = True
-                # Extract content after bullet marker
-                content = re.sub(r'^[-*+•]\s+', '', stripped)
-                formatted_lines.append(f'<li>{content}</li>')
-            # Check if line is a numbered list
-            elif re.match(r'^\d+\.\s+', stripped):
-                if not in_list:
-                    formatted_lines.append('<ul>')
-                    in_list = True
-                content = re.sub(r'^\d+\.\s+', '', stripped)
-                formatted_lines.append(f'<li>{content}</li>')
+        line = re.sub(r'^#+\s+(.+)$', r'<strong>\1</strong>', line)
+
+        stripped = line.strip()
+        output = ""
+
+        # Bullet points and numbered lists both become <li> items
+        marker = self._BULLET if self._BULLET.match(stripped) else self._NUMBERED
+        if marker.match(stripped):
+            if not self._in_list:
+                output += '<ul>\n'
+                self._in_list = True
+            # Extract content after the list marker
+            content = marker.sub('', stripped)
+            return output + f'<li>{content}</li>\n'
+
+        if self._in_list:
+            output += '</ul>\n'
+            self._in_list = False
+        if stripped:
+            # Wrap non-empty lines in <p> tags if not already HTML
+            if not stripped.startswith('<'):
+                output += f'<p>{stripped}</p>\n'
             else:
-                if in_list:
-                    formatted_lines.append('</ul>')
-                    in_list = False
-                if stripped:
-                    # Wrap non-empty lines in <p> tags if not already HTML
-                    if not stripped.startswith('<'):
-                        formatted_lines.append(f'<p>{stripped}</p>')
-                    else:
-                        formatted_lines.append(stripped)
-
-        if in_list:
-            formatted_lines.append('</ul>')
-
-        return '\n'.join(formatted_lines).strip()
+                output += f'{stripped}\n'
+        return output
@@ -0,0 +1,156 @@
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+# Plain text, or a stream of text pieces (e.g. the lines of an open file)
+TextStream = Union[str, Iterable[str]]
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+_MAX_BUFFER = 8192
+
+
+def _sentences(paragraph: str) -> Iterator[str]:
+    start = 0
+    for match in _SENTENCE_END.finditer(paragraph):
+        sentence = paragraph[start:match.start()].strip()
+        if sentence:
+            yield sentence
+        start = match.end()
+    sentence = paragraph[start:].strip()
+    if sentence:
+        yield sentence
+
+
+def iter_sentences(text: TextStream) -> Iterator[Tuple[str, bool]]:
+    """Yield (sentence, ends_paragraph) pairs from text or a stream of text pieces.
+
+    Only the unfinished tail of the stream is buffered: complete paragraphs and
+    sentences are yielded as soon as the text following them arrives.
+    """
+    if isinstance(text, str):
+        text = (text,)
+
+    buffer = ""
+    for piece in text:
+        buffer += piece
+        *paragraphs, buffer = _PARAGRAPH_BREAK.split(buffer)
+        for paragraph in paragraphs:
+            sentences = list(_sentences(paragraph))
+            for i, sentence in enumerate(sentences):
+                yield sentence, i == len(sentences) - 1
+
+        # Release finished sentences of the open paragraph; a boundary only
+        # counts once text follows it, so a split paragraph break is not lost
+        last_end = 0
+        for match in _SENTENCE_END.finditer(buffer):
+            if match.end() < len(buffer):
+                last_end = match.end()
+        if last_end:
+            for sentence in _sentences(buffer[:last_end]):
+                yield sentence, False
+            buffer = buffer[last_end:]
+        while len(buffer) > _MAX_BUFFER:
+            # No sentence boundary in sight: break at the last whitespace, or
+            # anywhere when there is none
+            cut = max(buffer.rfind(" ", 0, _MAX_BUFFER), buffer.rfind("\n", 0, _MAX_BUFFER)) + 1 or _MAX_BUFFER
+            for sentence in _sentences(buffer[:cut]):
+                yield sentence, False
+            buffer = buffer[cut:]
+
+    sentences = list(_sentences(buffer))
+    for i, sentence in enumerate(sentences):
+        yield sentence, i == len(sentences) - 1
+
+
+class TextChunker:
+    """Packs sentences into chunks of at most ``max_tokens`` embedding-model tokens.
+
+    Chunks break between sentences, and at a paragraph end once a chunk is at
+    least half full. When the budget forces a break, the trailing sentences
+    (up to ``overlap_tokens``) are repeated at the start of the next chunk. A
+    sentence longer than the budget is split between words, and a word longer
+    than the budget is split within it.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], max_tokens: int = 240, overlap_tokens: int = 40):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+
+    def chunks(self, text: TextStream) -> Iterator[str]:
+        """Yield chunks from text or a stream of text pieces"""
+        window: List[List] = []  # [sentence, tokens, ends_paragraph]
+        size = 0
+        fresh = False  # window holds text not yet emitted
+
+        for sentence, ends_paragraph in iter_sentences(text):
+            for piece, tokens in self._fit(sentence):
+                if window and size + tokens > self.max_tokens:
+                    yield self._join(window)
+                    window = self._overlap(window, self.max_tokens - tokens)
+                    size = sum(entry[1] for entry in window)
+                window.append([piece, tokens, False])
+                size += tokens
+                fresh = True
+            window[-1][2] = ends_paragraph
+            if ends_paragraph and size * 2 >= self.max_tokens:
+                yield self._join(window)
+                window, size, fresh = [], 0, False
+
+        if fresh:
+            yield self._join(window)
+
+    def _fit(self, sentence: str) -> Iterator[Tuple[str, int]]:
+        tokens = self.count_tokens(sentence)
+        if tokens <= self.max_tokens:
+            yield sentence, tokens
+            return
+        words: List[str] = []
+        size = 0
+        for word in sentence.split():
+            word_tokens = self.count_tokens(word)
+            if words and size + word_tokens > self.max_tokens:
+                yield " ".join(words), size
+                words, size = [], 0
+            if word_tokens > self.max_tokens:
+                yield from self._split_word(word)
+                continue
+            words.append(word)
+            size += word_tokens
+        if words:
+            yield " ".join(words), size
+
+    def _split_word(self, word: str) -> Iterator[Tuple[str, int]]:
+        while word:
+            tokens = self.count_tokens(word)
+            if tokens <= self.max_tokens:
+                yield word, tokens
+                return
+            # Guess the cut from the average token length, then back off until it fits
+            end = max(1, len(word) * self.max_tokens // tokens)
+            while end > 1 and self.count_tokens(word[:end]) > self.max_tokens:
+                end = max(1, end * 9 // 10)
+            yield word[:end], self.count_tokens(word[:end])
+            word = word[end:]
+
+    def _overlap(self, window: List[List], room: int) -> List[List]:
+        budget = min(self.overlap_tokens, room)
+        kept: List[List] = []
+        size = 0
+        for entry in reversed(window):
+            if size + entry[1] > budget:
+                break
+            kept.insert(0, entry)
+            size += entry[1]
+        return kept
+
+    @staticmethod
+    def _join(window: List[List]) -> str:
+        parts = []
+        for i, (sentence, _, ends_paragraph) in enumerate(window):
+            parts.append(sentence)
+            if i < len(window) - 1:
+                parts.append("\n\n" if ends_paragraph else " ")
+        return "".join(parts)
@@ -0,0 +1,145 @@
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def _overlap_length(first: str, second: str, probe_length: int = 32) -> int:
+    """Length of the longest suffix of ``first`` that is a prefix of ``second``"""
+    probe = second[:probe_length]
+    if not probe:
+        return 0
+    # Overlaps at least as long as the probe contain it
+    start = first.find(probe)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    # Shorter ones are compared directly; they must start on a word boundary
+    for length in range(min(len(first), len(second), probe_length), 0, -1):
+        start = len(first) - length
+        if first.endswith(second[:length]) and (start == 0 or first[start - 1].isspace()):
+            return length
+    return 0
+
+
+def _distance(item: Dict) -> float:
+    distance = item.get("distance")
+    return float("inf") if distance is None else distance
+
+
+class ContextPacker:
+    """Turn retrieved chunks into the prompt context within a token budget.
+
+    Chunks are merged when they are neighbours from the same source (their
+    shared overlap is kept once), near-duplicates are dropped by word-set
+    similarity, and the rest are taken in retrieval order while they fit
+    in ``token_budget``.
+    """
+
+    def __init__(self, token_budget: int = 1200, duplicate_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self._lock = threading.Lock()
+        self.packed = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str]) -> "ContextPacker":
+        """Build a packer from CONTEXT_* settings"""
+        return cls(
+            token_budget=int(env.get("CONTEXT_TOKEN_BUDGET", "1200")),
+            duplicate_threshold=float(env.get("CONTEXT_DEDUP_THRESHOLD", "0.8")),
+        )
+
+    def pack(self, sources: Optional[List[Dict]]) -> List[Dict]:
+        """Merge, deduplicate and budget retrieved chunks, keeping their rank order"""
+        if not sources:
+            return []
+
+        items = [item for _, item in sorted(self._merge_neighbours(sources), key=lambda ranked: ranked[0])]
+
+        kept: List[Dict] = []
+        kept_words: List[set] = []
+        used = 0
+        for item in items:
+            words = set(_WORD.findall(item["text"].lower()))
+            if any(self._is_duplicate(words, other) for other in kept_words):
+                continue
+            tokens = estimate_tokens(f"[Source: {item['source']}]\n{item['text']}")
+            if used + tokens > self.token_budget:
+                if not kept:
+                    # Never send an empty context: trim the best chunk to fit
+                    kept.append(dict(item, text=self._truncate(item["text"], self.token_budget)))
+                    kept_words.append(words)
+                    used = self.token_budget
+                continue
+            kept.append(item)
+            kept_words.append(words)
+            used += tokens
+
+        with self._lock:
+            self.packed += 1
+            self.tokens_in += sum(estimate_tokens(item.get("text", "")) for item in sources)
+            self.tokens_out += used
+        return kept
+
+    @staticmethod
+    def _merge_neighbours(sources: List[Dict]) -> List[Tuple[int, Dict]]:
+        """Merged chunks, each with the best retrieval rank among its parts"""
+        by_source: Dict[str, List[Tuple[int, Dict]]] = {}
+        for rank, item in enumerate(sources):
+            by_source.setdefault(item.get("source", "unknown"), []).append((rank, item))
+
+        merged: List[Tuple[int, Dict]] = []
+        for items in by_source.values():
+            items = sorted(items, key=lambda ranked: ranked[1].get("chunk", 0))
+            rank, current = items[0][0], dict(items[0][1])
+            last_chunk = current.get("chunk", 0)
+            for item_rank, item in items[1:]:
+                overlap = _overlap_length(current["text"], item["text"])
+                if overlap or item.get("chunk", 0) == last_chunk + 1:
+                    separator = "" if overlap else "\n"
+                    current["text"] = current["text"] + separator + item["text"][overlap:]
+                    current["distance"] = min(_distance(current), _distance(item))
+                    rank = min(rank, item_rank)
+                else:
+                    merged.append((rank, current))
+                    rank, current = item_rank, dict(item)
+                last_chunk = item.get("chunk", 0)
+            merged.append((rank, current))
+        return merged
+
+    def _is_duplicate(self, words: set, other: set) -> bool:
+        if not words or not other:
+            return False
+        # Containment rather than Jaccard, so a chunk inside a merged one counts
+        return len(words & other) / min(len(words), len(other)) >= self.duplicate_threshold
+
+    @staticmethod
+    def _truncate(text: str, token_budget: int) -> str:
+        limit = token_budget * 4
+        if len(text) <= limit:
+            return text
+        cut = text[:limit]
+        boundary = max(cut.rfind(". "), cut.rfind("\n"))
+        if boundary > limit // 2:
+            return cut[:boundary + 1]
+        return cut.rsplit(" ", 1)[0]
+
+    def stats(self) -> Dict:
+        """Estimated prompt tokens before and after packing"""
+        with self._lock:
+            return {
+                "packed": self.packed,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "saved_ratio": round(1 - self.tokens_out / self.tokens_in, 4) if self.tokens_in else 0.0,
+            }
@@ -0,0 +1,110 @@
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TorchEmbeddingBackend:
+    """SentenceTransformer (PyTorch) embeddings"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer  # lazy import: pulls in torch
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into normalized float32 vectors"""
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of word-piece tokens (without special tokens) in text"""
+        return len(self.model.tokenizer.encode(text, add_special_tokens=False))
+
+
+class OnnxEmbeddingBackend:
+    """ONNX Runtime embeddings for an exported (optionally int8-quantized) transformer.
+
+    Reproduces the sentence-transformers pipeline for MiniLM-style models:
+    word-piece tokenization truncated to ``max_seq_length``, attention-masked
+    mean pooling, then L2 normalization. Build the model file with
+    ``scripts/export_onnx_embeddings.py``.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, model_path: str, max_seq_length: int = 256, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=onnx requires the onnxruntime and tokenizers packages"
+            ) from exc
+
+        if not os.path.exists(model_path):
+            raise RuntimeError(
+                f"ONNX embedding model not found at {model_path}; run scripts/export_onnx_embeddings.py first"
+            )
+
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+
+        self.tokenizer = Tokenizer.from_pretrained(model_name)
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {item.name for item in self.session.get_inputs()}
+        logger.info("Loaded ONNX embedding model from %s", model_path)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into normalized float32 vectors"""
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(batches)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of word-piece tokens (without special tokens) in text"""
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def create_embedding_backend(model_name: str, backend: Optional[str] = None):
+    """Build the embedding backend named by EMBEDDING_BACKEND (torch or onnx)"""
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "torch")).lower()
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_name)
+    if backend == "onnx":
+        return OnnxEmbeddingBackend(
+            model_name,
+            model_path=os.getenv("EMBEDDING_ONNX_PATH", "./models/all-MiniLM-L6-v2-int8.onnx"),
+            max_seq_length=int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "256")),
+            num_threads=int(os.getenv("EMBEDDING_THREADS", "0")),
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use 'torch' or 'onnx'.")
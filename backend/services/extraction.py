@@ -0,0 +1,223 @@
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A file on disk (read inside the worker) or an in-memory (source, content, kind) triple
+ExtractionItem = Union[Path, Tuple[str, bytes, str]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def extraction_workers() -> int:
+    """Worker processes for text extraction (EXTRACTION_WORKERS, default: CPU count)"""
+    return max(1, int(os.getenv("EXTRACTION_WORKERS", "0")) or os.cpu_count() or 1)
+
+
+def detect_kind(name: str, content_type: str = "") -> Optional[str]:
+    """Map a filename (and optional Content-Type) to txt, pdf or html"""
+    name = name.lower()
+    content_type = content_type.lower()
+    if name.endswith(".pdf") or "pdf" in content_type:
+        return "pdf"
+    if name.endswith(".txt"):
+        return "txt"
+    if name.endswith((".html", ".htm")) or "html" in content_type:
+        return "html"
+    return None
+
+
+def sanitize_text(text: str) -> str:
+    """Collapse whitespace and strip leading/trailing spaces."""
+    text = re.sub(r"\r\n?", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    return text.strip()
+
+
+def extract_html_text(content: bytes) -> str:
+    """Parse HTML content and extract readable text."""
+    from bs4 import BeautifulSoup  # lazy import: only extraction workers need it
+
+    soup = BeautifulSoup(content, "html.parser")
+
+    # Remove scripts, styles, navs that add noise.
+    for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "form"]):
+        tag.decompose()
+
+    text = soup.get_text(separator="\n")
+    return sanitize_text(text)
+
+
+def _page_texts(pages) -> List[str]:
+    texts = []
+    for page in pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to extract a PDF page: %s", exc)
+    return texts
+
+
+def extract_pdf_text(content: bytes) -> str:
+    """Extract text from a PDF document."""
+    from pypdf import PdfReader  # lazy import: only extraction workers need it
+
+    reader = PdfReader(BytesIO(content))
+    return sanitize_text("\n\n".join(_page_texts(reader.pages)))
+
+
+def pdf_page_count(path: Union[str, Path]) -> int:
+    """Number of pages in a PDF file"""
+    from pypdf import PdfReader
+
+    return len(PdfReader(str(path)).pages)
+
+
+def extract_pdf_pages(path: Union[str, Path], start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) of a PDF file, one string per page"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(str(path))
+    return _page_texts(reader.pages[start:stop])
+
+
+def extract_bytes(content: bytes, kind: str) -> str:
+    """Extract plain text from raw file content of the given kind"""
+    if kind == "pdf":
+        return extract_pdf_text(content)
+    if kind == "html":
+        return extract_html_text(content)
+    if kind == "txt":
+        return content.decode("utf-8", errors="replace")
+    raise ValueError(f"Unsupported document type: {kind}")
+
+
+def extract_file(path: Union[str, Path], kind: str) -> str:
+    """Extract plain text from a file on disk"""
+    return extract_bytes(Path(path).read_bytes(), kind)
+
+
+def _extract_item(item: ExtractionItem) -> Tuple[str, str]:
+    if isinstance(item, Path):
+        kind = detect_kind(item.name)
+        return item.name, extract_bytes(item.read_bytes(), kind)
+    source, content, kind = item
+    return source, extract_bytes(content, kind)
+
+
+def _item_name(item: ExtractionItem) -> str:
+    return item.name if isinstance(item, Path) else item[0]
+
+
+def _new_pool(max_workers: int) -> ProcessPoolExecutor:
+    # spawn: workers must not inherit the server's model weights or threads
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def iter_extracted(items: Iterable[ExtractionItem], max_workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """Extract text in a process pool, yielding (source, text) as each item finishes.
+
+    At most two items per worker are in flight, so a large input stream is
+    never held in memory at once. Items that fail are logged and skipped.
+    """
+    max_workers = max_workers or extraction_workers()
+    items = iter(items)
+
+    if max_workers <= 1:
+        for item in items:
+            try:
+                yield _extract_item(item)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Failed to extract %s: %s", _item_name(item), exc)
+        return
+
+    with _new_pool(max_workers) as pool:
+        pending: Dict[Future, str] = {}
+
+        def submit_next() -> bool:
+            item = next(items, None)
+            if item is None:
+                return False
+            pending[pool.submit(_extract_item, item)] = _item_name(item)
+            return True
+
+        while len(pending) < max_workers * 2 and submit_next():
+            pass
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as exc:  # noqa: BLE001
+                    logger.error("Failed to extract %s: %s", name, exc)
+                submit_next()
+
+
+def _shared_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(extraction_workers())
+    return _pool
+
+
+def iter_pdf_pages(
+    path: Union[str, Path],
+    page_batch: int = 16,
+    prefetch: int = 2,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[str]:
+    """Yield the text of each page of a PDF file as it is extracted.
+
+    Pages are extracted ``page_batch`` at a time in the shared process pool,
+    with up to ``prefetch`` batches running ahead of the consumer.
+    ``progress(pages_done, pages_total)`` is called as each batch arrives.
+    """
+    pool = _shared_pool()
+    total = pool.submit(pdf_page_count, path).result()
+    if progress is not None:
+        progress(0, total)
+    starts = iter(range(0, total, max(1, page_batch)))
+    pending: Deque[Tuple[int, Future]] = deque()
+
+    def submit_next() -> None:
+        start = next(starts, None)
+        if start is not None:
+            stop = min(total, start + page_batch)
+            pending.append((stop, pool.submit(extract_pdf_pages, path, start, stop)))
+
+    for _ in range(max(1, prefetch)):
+        submit_next()
+    try:
+        while pending:
+            stop, future = pending.popleft()
+            texts = future.result()
+            submit_next()
+            if progress is not None:
+                progress(stop, total)
+            yield from texts
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def shutdown_pool() -> None:
+    """Stop the shared extraction pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
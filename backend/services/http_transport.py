@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict
+
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TransportSettings:
+    """Connection pool, timeout and retry settings for one provider's HTTP client"""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 5.0
+    max_retries: int = 2
+    warmup_connections: int = 1
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str], provider: str) -> "TransportSettings":
+        """Read ``<PROVIDER>_HTTP_*`` settings, falling back to ``LLM_HTTP_*`` and the defaults"""
+        prefix = provider.upper()
+
+        def setting(name: str, default):
+            value = env.get(f"{prefix}_HTTP_{name}") or env.get(f"LLM_HTTP_{name}")
+            if value is None or value == "":
+                return default
+            if isinstance(default, bool):
+                return value.lower() in ("1", "true", "yes")
+            return type(default)(value)
+
+        defaults = cls()
+        return cls(**{
+            field: setting(field.upper(), getattr(defaults, field))
+            for field in cls.__dataclass_fields__
+        })
+
+
+def build_http_client(settings: TransportSettings) -> httpx.AsyncClient:
+    """An AsyncClient with a bounded keep-alive pool and explicit timeouts"""
+    http2 = settings.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.connect_timeout,
+            read=settings.read_timeout,
+            write=settings.write_timeout,
+            pool=settings.pool_timeout,
+        ),
+    )
+
+
+async def warm_up_connections(http_client: httpx.AsyncClient, base_url: str, connections: int) -> int:
+    """Open keep-alive connections (DNS, TCP and TLS) ahead of the first request.
+
+    Sends ``connections`` concurrent HEAD requests to the provider's base URL;
+    any HTTP response leaves a pooled connection behind. Returns how many
+    succeeded. Failures are logged, never raised.
+    """
+    if connections <= 0:
+        return 0
+
+    async def touch() -> bool:
+        try:
+            await http_client.head(base_url)
+            return True
+        except httpx.HTTPError as exc:
+            logger.warning("Connection warm-up to %s failed: %s", base_url, exc)
+            return False
+
+    results = await asyncio.gather(*(touch() for _ in range(connections)))
+    return sum(results)
@@ -0,0 +1,277 @@
+import asyncio
+import functools
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_COLUMNS = (
+    "job_id", "filename", "kind", "status", "result", "pages_done", "pages_total",
+    "chunks_done", "chunks_total", "chunks_created", "error", "created_at", "updated_at",
+)
+
+
+class IngestQueueFull(Exception):
+    """Too many uploads are already waiting; retry after ``retry_after`` seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many documents are being processed; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class IngestJobStore:
+    """Upload job records in a SQLite (WAL) file, so any worker can report on any job.
+
+    Finished jobs older than ``ttl`` seconds are pruned as new jobs arrive.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self.path = str(Path(path).resolve())
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        # Switching to WAL takes an exclusive lock that ignores the busy timeout,
+        # so only do it once (the pre-fork launcher does it before forking)
+        if self._db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS ingest_jobs (
+                job_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                pages_done INTEGER NOT NULL DEFAULT 0,
+                pages_total INTEGER,
+                chunks_done INTEGER NOT NULL DEFAULT 0,
+                chunks_total INTEGER,
+                chunks_created INTEGER,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str]) -> "IngestJobStore":
+        """Open the job store named by INGEST_JOB_DB"""
+        return cls(
+            env.get("INGEST_JOB_DB", "./data/ingest_jobs.db"),
+            ttl=float(env.get("INGEST_JOB_TTL", "86400")),
+        )
+
+    def create(self, filename: str, kind: str) -> Dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self.ttl and self.ttl > 0:
+                self._db.execute(
+                    "DELETE FROM ingest_jobs WHERE status IN ('done', 'failed') AND updated_at <= ?",
+                    (now - self.ttl,),
+                )
+            self._db.execute(
+                "INSERT INTO ingest_jobs (job_id, filename, kind, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, filename, kind, now, now),
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields) -> None:
+        unknown = set(fields) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE ingest_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM ingest_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_progress_stores: Dict[str, IngestJobStore] = {}
+_progress_lock = threading.Lock()
+
+
+class JobProgress:
+    """Picklable progress(stage, done, total) callback recording a job's page and chunk progress.
+
+    Only the store path and job id are pickled, so the callback also works
+    when the embedding runs in the pre-fork writer process.
+    """
+
+    def __init__(self, store_path: str, job_id: str):
+        self.store_path = store_path
+        self.job_id = job_id
+
+    def __call__(self, stage: str, done: int, total: Optional[int]) -> None:
+        if stage not in ("pages", "chunks"):
+            raise ValueError(f"Unknown progress stage: {stage}")
+        with _progress_lock:
+            store = _progress_stores.get(self.store_path)
+            if store is None:
+                store = _progress_stores[self.store_path] = IngestJobStore(self.store_path, ttl=0)
+        store.update(self.job_id, **{f"{stage}_done": done, f"{stage}_total": total})
+
+
+class IngestJobManager:
+    """Runs uploaded documents through extraction, chunking and embedding in the background.
+
+    Uploads are copied to a spool file on disk and queued; the request
+    returns straight away with the job. ``workers`` jobs run at a time and
+    at most ``max_pending`` may be queued or running before new uploads are
+    refused. Each job streams the file through RAGService.ingest_file.
+    """
+
+    def __init__(
+        self,
+        rag,
+        store: IngestJobStore,
+        spool_dir: str,
+        workers: int = 1,
+        max_pending: int = 16,
+    ):
+        self.rag = rag
+        self.store = store
+        self.spool_dir = Path(spool_dir).resolve()
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._job_seconds = 30.0  # moving average of job duration, for Retry-After
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str], rag) -> "IngestJobManager":
+        """Build a manager from INGEST_* settings"""
+        return cls(
+            rag,
+            IngestJobStore.from_env(env),
+            env.get("INGEST_SPOOL_DIR", "./data/uploads"),
+            workers=int(env.get("INGEST_JOB_WORKERS", "1")),
+            max_pending=int(env.get("INGEST_MAX_PENDING", "16")),
+        )
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, upload: BinaryIO, filename: str, kind: str) -> Dict:
+        """Spool an uploaded file to disk and queue it; returns the new job"""
+        if self.pending >= self.max_pending:
+            raise IngestQueueFull(max(1, math.ceil(self.pending / self.workers * self._job_seconds)))
+        fd, path = tempfile.mkstemp(dir=self.spool_dir, suffix=f".{kind}")
+        os.close(fd)
+        self.pending += 1
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._spool, upload, path)
+            job = await self._in_executor(self.store.create, filename, kind)
+        except BaseException:
+            self.pending -= 1
+            self._remove(path)
+            raise
+        self._queue.put_nowait((job["job_id"], path, filename, kind))
+        logger.info("Queued %s as job %s", filename, job["job_id"])
+        return job
+
+    @staticmethod
+    def _spool(upload: BinaryIO, path: str) -> None:
+        upload.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(upload, out, 1024 * 1024)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    @staticmethod
+    async def _in_executor(func, *args, **kwargs):
+        """Run a job store call off the event loop; SQLite commits can wait on the disk"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, path, filename, kind = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                await self._run(job_id, path, filename, kind)
+            finally:
+                self.pending -= 1
+                self._job_seconds = 0.8 * self._job_seconds + 0.2 * (time.perf_counter() - started)
+                self._remove(path)
+
+    async def _run(self, job_id: str, path: str, filename: str, kind: str) -> None:
+        try:
+            await self._in_executor(self.store.update, job_id, status="running")
+            result = await self.rag.aingest_file(path, kind, filename, JobProgress(self.store.path, job_id))
+            await self._in_executor(
+                self.store.update,
+                job_id,
+                status="done",
+                result="unchanged" if result.unchanged else "success",
+                chunks_created=result.chunks_written,
+            )
+            logger.info("Job %s: %s indexed (%d chunks embedded)", job_id, filename, result.chunks_written)
+        except asyncio.CancelledError:
+            # Shielded: the task is being cancelled, but the record must still be written
+            await asyncio.shield(
+                self._in_executor(self.store.update, job_id, status="failed", error="Interrupted by server shutdown")
+            )
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Job %s (%s) failed: %s", job_id, filename, exc)
+            await self._in_executor(self.store.update, job_id, status="failed", error=str(exc))
+
+    def stats(self) -> Dict:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+            "jobs": self.store.counts(),
+        }
+
+    async def aclose(self) -> None:
+        """Stop the workers; queued jobs are marked failed and their spool files removed"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            job_id, path, _, _ = self._queue.get_nowait()
+            await self._in_executor(self.store.update, job_id, status="failed", error="Interrupted by server shutdown")
+            self._remove(path)
+        self.store.close()
@@ -0,0 +1,143 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; hyphenated terms (McKinney-Vento) also yield their parts"""
+    tokens = []
+    for match in _TOKEN.findall(text.lower()):
+        tokens.append(match)
+        if "-" in match:
+            tokens.extend(part for part in match.split("-") if part)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, persisted as JSON.
+
+    The index is maintained at ingestion time (one per index version, see
+    RAGService.rebuild) and reloaded when another process rewrites the file.
+    """
+
+    def __init__(self, path: Optional[Path] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._stamp: Optional[tuple] = None
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def exists(self) -> bool:
+        """Whether a persisted index is on disk"""
+        return bool(self.path and self.path.exists())
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        """Index documents, replacing any previous text under the same id"""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._doc_terms:
+                    self._remove_one(doc_id)
+                terms = Counter(tokenize(text))
+                self._doc_terms[doc_id] = dict(terms)
+                self._doc_lengths[doc_id] = sum(terms.values())
+                self._total_length += self._doc_lengths[doc_id]
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = frequency
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Drop documents from the index"""
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._doc_terms:
+                    self._remove_one(doc_id)
+
+    def _remove_one(self, doc_id: str) -> None:
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    def clear(self) -> None:
+        """Drop every document"""
+        with self._lock:
+            self._doc_terms.clear()
+            self._postings.clear()
+            self._doc_lengths.clear()
+            self._total_length = 0
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return the top-k (id, BM25 score) pairs for a query"""
+        self.refresh()
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self) -> None:
+        """Write the index atomically"""
+        if not self.path:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"k1": self.k1, "b": self.b, "docs": self._doc_terms}), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._stamp = self._file_stamp()
+
+    def refresh(self) -> None:
+        """Reload the index if the file was rewritten by another process"""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        with self._lock:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.clear()
+            for doc_id, terms in data["docs"].items():
+                self._doc_terms[doc_id] = terms
+                self._doc_lengths[doc_id] = sum(terms.values())
+                self._total_length += self._doc_lengths[doc_id]
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = frequency
+            self._stamp = stamp
+            logger.info("Loaded lexical index with %d documents from %s", len(self._doc_terms), self.path)
+
+    def _file_stamp(self) -> Optional[tuple]:
+        if not self.path:
+            return None
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,56 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+def threaded(items: Iterable[T], maxsize: int = 2, name: str = "pipeline") -> Iterator[T]:
+    """Produce ``items`` in a background thread and hand them over through a bounded queue.
+
+    Chaining calls gives a pipeline with one thread per stage in which each
+    stage runs at most ``maxsize`` items ahead of the next. An exception in
+    a stage is re-raised in the consumer; if the consumer stops early the
+    producer stops after its current item.
+    """
+    handoff: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as exc:  # noqa: BLE001
+            put((_END, exc))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = handoff.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
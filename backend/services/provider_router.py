@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ProviderFailed(Exception):
+    """Every candidate provider failed; ``provider`` is the one whose error is reported"""
+
+    def __init__(self, provider: str, error: Exception):
+        super().__init__(str(error))
+        self.provider = provider
+        self.error = error
+
+
+class ProviderHealth:
+    """Rolling latency/error window and circuit breaker for one provider.
+
+    The breaker opens after ``failure_threshold`` consecutive failures and
+    stays open for ``cooldown`` seconds; after that one trial request is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, window: int = 100, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def claim(self) -> Optional[bool]:
+        """Whether a request may be sent now: None if not, True if it takes the single half-open trial"""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return None
+
+    def record(self, latency: float, ok: bool) -> None:
+        self._samples.append((latency, ok))
+        self._trial_in_flight = False
+        if ok:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            return
+        self.consecutive_failures += 1
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a claimed trial slot when the request was not sent or did not finish"""
+        self._trial_in_flight = False
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100.0 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def successes(self) -> int:
+        return sum(1 for _, ok in self._samples if ok)
+
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+
+class ProviderRouter:
+    """Orders providers for a request by circuit state and recent p95 latency"""
+
+    def __init__(
+        self,
+        providers: List[str],
+        window: int = 100,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        failover: bool = True,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        self.failover = failover
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {
+            name: ProviderHealth(window, failure_threshold, cooldown) for name in providers
+        }
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str], providers: List[str]) -> "ProviderRouter":
+        """Build a router from LLM_ROUTER_* / LLM_BREAKER_* / LLM_HEDGE_* settings"""
+        return cls(
+            providers,
+            window=int(env.get("LLM_ROUTER_WINDOW", "100")),
+            failure_threshold=int(env.get("LLM_BREAKER_FAILURES", "5")),
+            cooldown=float(env.get("LLM_BREAKER_COOLDOWN", "30")),
+            failover=env.get("LLM_FAILOVER", "true").lower() in ("1", "true", "yes"),
+            hedge=env.get("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            hedge_min_samples=int(env.get("LLM_HEDGE_MIN_SAMPLES", "20")),
+        )
+
+    def candidates(self, preferred: Optional[str]) -> Tuple[List[str], Set[str]]:
+        """Providers to try, in order: the preferred one, then the fastest healthy ones.
+
+        Providers whose breaker is open are skipped, so the list is empty when
+        every breaker is open. A half-open provider is only returned to one
+        caller at a time: the second value names the trials claimed here,
+        which the caller must record() or release().
+        """
+        with self._lock:
+            names = list(self._health)
+            if preferred not in self._health:
+                preferred = None
+            others = sorted(
+                (name for name in names if name != preferred),
+                key=lambda name: self._health[name].latency_percentile(95) or float("inf"),
+            )
+            ordered = ([preferred] if preferred else []) + others
+            if not self.failover:
+                ordered = ordered[:1]
+            allowed: List[str] = []
+            trials: Set[str] = set()
+            for name in ordered:
+                trial = self._health[name].claim()
+                if trial is None:
+                    continue
+                allowed.append(name)
+                if trial:
+                    trials.add(name)
+            return allowed, trials
+
+    def hedge_delay(self, provider: str) -> Optional[float]:
+        """Seconds to wait on ``provider`` before hedging (its p95), or None"""
+        if not self.hedge:
+            return None
+        with self._lock:
+            health = self._health.get(provider)
+            if health is None or health.successes() < self.hedge_min_samples:
+                return None
+            return health.latency_percentile(95)
+
+    def record(self, provider: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            health = self._health.get(provider)
+            if health is None:
+                return
+            was_open = health.opened_at is not None
+            health.record(latency, ok)
+            if not was_open and health.opened_at is not None:
+                logger.warning("Circuit opened for %s after %d failures", provider, health.consecutive_failures)
+            elif was_open and health.opened_at is None:
+                logger.info("Circuit closed for %s", provider)
+
+    def release(self, provider: str) -> None:
+        """Give back a half-open trial claimed by candidates() that was not sent or did not finish"""
+        with self._lock:
+            health = self._health.get(provider)
+            if health is not None:
+                health.release()
+
+    def count(self, event: str) -> None:
+        """Count a failover, hedge or hedge win"""
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+
+    def stats(self) -> Dict:
+        """Per-provider latency, error rate and circuit state"""
+        with self._lock:
+            providers = {}
+            for name, health in self._health.items():
+                p50 = health.latency_percentile(50)
+                p95 = health.latency_percentile(95)
+                providers[name] = {
+                    "state": health.state,
+                    "error_rate": round(health.error_rate(), 4),
+                    "p50_ms": round(p50 * 1000.0, 1) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000.0, 1) if p95 is not None else None,
+                    "consecutive_failures": health.consecutive_failures,
+                }
+            return {
+                "providers": providers,
+                "failovers": self.failovers,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
@@ -1,6 +1,17 @@
+import asyncio
+import functools
+import hashlib
+import json
 import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
 
 import chromadb
 try:
@@ -8,12 +19,166 @@ try:
 except ImportError:
     # Newer versions of ChromaDB don't have InvalidCollectionException
     InvalidCollectionException = ValueError
-from sentence_transformers import SentenceTransformer
 import logging
 
+import numpy as np
+
+from backend.services.cache import TTLCache
+from backend.services.chunker import TextChunker, TextStream
+from backend.services.embeddings import create_embedding_backend
+from backend.services.extraction import extract_file, iter_pdf_pages, sanitize_text
+from backend.services.lexical_index import BM25Index
+from backend.services.pipeline import threaded
+from backend.services.vector_index import NumpyVectorStore
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+# progress(stage, done, total) callback for long-running ingestion; stage is
+# "pages" (PDF pages extracted) or "chunks" (chunks embedded), total may be None
+Progress = Callable[[str, int, Optional[int]], None]
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-query encodes into one batched encode call.
+
+    Callers block in encode(), or wait on the future from submit(), while a
+    scheduler thread gathers the queries that arrive within ``max_wait_ms`` of
+    the first one (up to ``max_batch_size``), encodes them together and fans
+    the vectors back out.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], Sequence], max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text: str) -> Future:
+        """Queue one text for the next batch; the future resolves to its vector"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> List[float]:
+        """Encode one text as part of the next batch"""
+        return self.submit(text).result()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch: List[Tuple[str, Future]]) -> None:
+        try:
+            vectors = self._encode([text for text, _ in batch])
+        except Exception as exc:  # noqa: BLE001
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector.tolist())
+
+    def stats(self) -> Dict[str, float]:
+        """Return batch counters"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def close(self) -> None:
+        """Stop the scheduler thread after it drains pending work"""
+        if self._thread is not None:
+            self._queue.put(None)
+
+
+@dataclass
+class IngestResult:
+    """Outcome of ingesting one source"""
+    source: str
+    chunks: int = 0
+    chunks_written: int = 0
+    chunks_removed: int = 0
+    unchanged: bool = False
+
+
+class IndexVersion:
+    """One physical collection and its BM25 index.
+
+    Queries resolve the alias to an IndexVersion once and use it for every
+    step, so an alias switch mid-query cannot mix two versions.
+    """
+
+    def __init__(self, name: str, collection, lexical_index: Optional[BM25Index] = None):
+        self.name = name
+        self.collection = collection
+        self.lexical_index = lexical_index
+
+
+class StageTimings:
+    """Running latency totals per retrieval stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean and max milliseconds for each stage"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "avg_ms": round(total * 1000.0 / count, 3) if count else 0.0,
+                    "max_ms": round(peak * 1000.0, 3),
+                }
+                for stage, (count, total, peak) in self._stages.items()
+            }
+
 
 class RAGService:
     """Service for managing RAG (Retrieval-Augmented Generation)"""
@@ -21,78 +186,691 @@ class RAGService:
     def __init__(self):
         self.collection_name = os.getenv("COLLECTION_NAME", "documents")
         self.embedding_model_name = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        self.chunk_size = int(os.getenv("CHUNK_SIZE", "1000"))
-        self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "200"))
+        self.embedding_backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+        # Chunk budget in embedding-model tokens (capped to the model's window)
+        self.chunk_tokens = int(os.getenv("CHUNK_TOKENS", "240"))
+        self.chunk_overlap_tokens = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
         self.persist_directory = Path(os.getenv("CHROMA_DIR", "./chroma_db")).resolve()
         self.persist_directory.mkdir(parents=True, exist_ok=True)
+        # Vector index: chroma (default) or numpy (in-process exact search over a
+        # memory-mapped matrix in NUMPY_INDEX_DIR)
+        self.index_backend = os.getenv("INDEX_BACKEND", "chroma").lower()
+        self.numpy_index_directory = Path(os.getenv("NUMPY_INDEX_DIR", "./numpy_index")).resolve()
+        self.index_directory = self.numpy_index_directory if self.index_backend == "numpy" else self.persist_directory
+
+        # Hybrid retrieval: BM25 over an inverted index maintained at ingestion,
+        # fused with the dense results by reciprocal rank
+        self.hybrid_search = os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", "4"))
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        self.bm25_k1 = float(os.getenv("BM25_K1", "1.5"))
+        self.bm25_b = float(os.getenv("BM25_B", "0.75"))
+        self.stage_timings = StageTimings()
+
+        # Bulk ingestion: encode batch size and chunks per collection write
+        self.encode_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+        self.write_batch_size = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "1000"))
+        # Streaming file ingestion: PDF pages per extraction task and items
+        # buffered between pipeline stages
+        self.page_batch = int(os.getenv("INGEST_PAGE_BATCH", "16"))
+        self.pipeline_depth = int(os.getenv("INGEST_PIPELINE_DEPTH", "2"))
+
+        # Bounded pool for CPU-bound encode and vector search, so async routes
+        # can await RAG work without blocking the event loop.
+        self.executor_workers = int(os.getenv("RAG_EXECUTOR_WORKERS", "4"))
+        self.executor = ThreadPoolExecutor(max_workers=self.executor_workers, thread_name_prefix="rag")
 
-        # Initialize ChromaDB persistent client
-        self.client = chromadb.PersistentClient(path=str(self.persist_directory))
+        # Warm-server caches: normalized query text -> embedding, and
+        # (query key, n_results) -> sources. Results are dropped whenever the
+        # collection changes; embeddings stay valid for the loaded model.
+        cache_ttl = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+        self.embedding_cache = TTLCache(maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")), ttl=cache_ttl)
+        self.result_cache = TTLCache(maxsize=int(os.getenv("QUERY_RESULT_CACHE_SIZE", "1024")), ttl=cache_ttl)
 
-        # Initialize embedding model
-        logger.info("Loading embedding model: %s", self.embedding_model_name)
-        self.embedding_model = SentenceTransformer(self.embedding_model_name)
+        # Micro-batch concurrent query encodes (EMBED_BATCH_MAX_SIZE=1 disables)
+        batch_size = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+        self.embedding_batcher = None
+        if batch_size > 1:
+            self.embedding_batcher = EmbeddingBatcher(
+                lambda texts: self.embedding_model.encode(texts),
+                max_batch_size=batch_size,
+                max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")),
+            )
 
-        # Get or create collection
+        # The embedding model and Chroma client are opened on first use (or by
+        # warm_up()), so constructing the service is cheap.
+        self._init_lock = threading.RLock()
+        self._embedding_model = None
+        self._client = None
+        self._active: Optional[IndexVersion] = None
+        self._building: Optional[IndexVersion] = None
+        self._rebuild_lock = threading.Lock()
+        self._chunker = None
+
+        # Blue/green rebuilds: COLLECTION_NAME is an alias, kept in
+        # <name>.alias.json, for a versioned physical collection (<name>__vN).
+        # Rebuilds fill a new version and switch the alias atomically; the
+        # INDEX_KEEP_VERSIONS newest versions are kept (at least two, so
+        # queries still running on the previous one can finish).
+        self.alias_path = self.index_directory / f"{self.collection_name}.alias.json"
+        self.keep_versions = max(2, int(os.getenv("INDEX_KEEP_VERSIONS", "2")))
+
+        # Every write bumps a generation marker next to the index so other
+        # processes (web workers, a running server while scripts ingest)
+        # drop their stale readers and cached results.
+        self.generation_path = self.index_directory / f"{self.collection_name}.generation"
+        self._generation_stamp = self._file_stamp(self.generation_path)
+
+        # Set in pre-fork web workers: writes go to the single writer process
+        self.writer = None
+
+    @property
+    def embedding_model(self):
+        """The embedding backend (torch or onnx, see EMBEDDING_BACKEND), loaded on first use"""
+        if self._embedding_model is None:
+            with self._init_lock:
+                if self._embedding_model is None:
+                    logger.info("Loading embedding model: %s (%s backend)", self.embedding_model_name, self.embedding_backend)
+                    self._embedding_model = create_embedding_backend(self.embedding_model_name, self.embedding_backend)
+        return self._embedding_model
+
+    @property
+    def client(self):
+        """The vector store client (ChromaDB or NumpyVectorStore), opened on first use"""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    if self.index_backend == "numpy":
+                        self._client = NumpyVectorStore(self.numpy_index_directory)
+                    elif self.index_backend == "chroma":
+                        self._client = chromadb.PersistentClient(path=str(self.persist_directory))
+                    else:
+                        raise ValueError(f"Unknown INDEX_BACKEND '{self.index_backend}'. Use 'chroma' or 'numpy'.")
+        return self._client
+
+    @property
+    def active(self) -> IndexVersion:
+        """The index version the alias points at, opened on first use"""
+        if self._active is None:
+            with self._init_lock:
+                if self._active is None:
+                    self._active = self._open_version(self._read_alias()["collection"])
+        return self._active
+
+    @property
+    def collection(self):
+        """The collection writes go to: the shadow during a rebuild, otherwise the active one"""
+        return self._target().collection
+
+    @property
+    def lexical_index(self) -> Optional[BM25Index]:
+        """The BM25 index writes go to (None when hybrid search is off)"""
+        return self._target().lexical_index
+
+    def _target(self) -> IndexVersion:
+        return self._building or self.active
+
+    def _open_version(self, name: str, create: bool = False) -> IndexVersion:
+        """Open (or create) a physical collection and its BM25 index, rebuilding the index if missing"""
+        collection = None
+        if not create:
+            try:
+                collection = self.client.get_collection(name=name)
+                logger.info("Loaded existing collection: %s", name)
+            except Exception:
+                # Collection doesn't exist, create it
+                pass
+        if collection is None:
+            collection = self.client.create_collection(name=name)
+            logger.info("Created new collection: %s", name)
+
+        lexical_index = None
+        if self.hybrid_search:
+            lexical_index = BM25Index(self.index_directory / f"{name}.bm25.json", k1=self.bm25_k1, b=self.bm25_b)
+            if lexical_index.exists():
+                lexical_index.refresh()
+            elif collection.count():
+                logger.info("Building lexical index for %s", name)
+                existing = collection.get(include=["documents"])
+                lexical_index.add(existing["ids"], existing["documents"])
+                lexical_index.save()
+        return IndexVersion(name, collection, lexical_index)
+
+    def _read_alias(self) -> Dict:
+        """The alias record; without one, the collection named COLLECTION_NAME itself is live"""
+        try:
+            return json.loads(self.alias_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {"collection": self.collection_name, "version": 0}
+
+    def _write_alias(self, record: Dict) -> None:
+        self.alias_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.alias_path.with_name(self.alias_path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(record), encoding="utf-8")
+        os.replace(tmp, self.alias_path)
+
+    @contextmanager
+    def rebuild(self) -> Iterator[IndexVersion]:
+        """Build a new version of the index and switch the alias to it when the block exits cleanly.
+
+        Inside the block, writes (add_documents, ingest_file, delete_source)
+        go to a new shadow collection while queries keep reading the current
+        version. The switch is one atomic rename of the alias file; queries
+        already running finish on the version they started with. If the
+        block raises, the shadow is dropped and the alias is left alone.
+        Versions beyond INDEX_KEEP_VERSIONS are deleted after the switch.
+        """
+        if self.writer is not None:
+            raise RuntimeError("Rebuilds write the index directly; run them outside the pre-fork web workers")
+        if not self._rebuild_lock.acquire(blocking=False):
+            raise RuntimeError("A rebuild is already in progress")
+        try:
+            self._sync_generation()
+            number = self._read_alias()["version"] + 1
+            name = f"{self.collection_name}__v{number}"
+            self._drop_version(name)  # left over from an interrupted rebuild
+            self._building = self._open_version(name, create=True)
+            logger.info("Rebuilding %s into %s", self.collection_name, name)
+            try:
+                yield self._building
+            except BaseException:
+                shadow, self._building = self._building, None
+                self._drop_version(shadow.name)
+                logger.warning("Rebuild of %s abandoned; %s dropped", self.collection_name, shadow.name)
+                raise
+            shadow, self._building = self._building, None
+            self._publish(shadow, number)
+        finally:
+            self._rebuild_lock.release()
+
+    def _publish(self, version: IndexVersion, number: int) -> None:
+        """Point the alias at ``version`` and delete versions beyond INDEX_KEEP_VERSIONS"""
+        self._write_alias({"collection": version.name, "version": number, "published_at": time.time()})
+        self._active = version
+        self.result_cache.clear()
+        self._bump_generation()
+        logger.info("Switched %s to %s (%d chunks)", self.collection_name, version.name, version.collection.count())
+
+        pattern = re.compile(rf"^{re.escape(self.collection_name)}(?:__v(\d+))?$")
+        versions = []
+        for collection in self.client.list_collections():
+            name = getattr(collection, "name", collection)
+            match = pattern.match(name)
+            if match:
+                versions.append((int(match.group(1) or 0), name))
+        for _, name in sorted(versions, reverse=True)[self.keep_versions:]:
+            self._drop_version(name)
+            logger.info("Deleted old index version %s", name)
+
+    def _drop_version(self, name: str) -> None:
         try:
-            self.collection = self.client.get_collection(name=self.collection_name)
-            logger.info("Loaded existing collection: %s", self.collection_name)
-        except Exception:
-            # Collection doesn't exist, create it
-            self.collection = self.client.create_collection(name=self.collection_name)
-            logger.info("Created new collection: %s", self.collection_name)
+            self.client.delete_collection(name=name)
+        except Exception:  # noqa: BLE001
+            pass  # already gone
+        (self.index_directory / f"{name}.bm25.json").unlink(missing_ok=True)
+
+    def index_stats(self) -> Dict:
+        """Which physical collection the alias points at, and any rebuild in progress"""
+        return {
+            "alias": self.collection_name,
+            "active": self.active.name,
+            "building": self._building.name if self._building else None,
+        }
+
+    def preload(self) -> None:
+        """Load the model weights (and the memory-mapped numpy index) without running inference.
+
+        Used by the pre-fork launcher before forking workers, so the pages
+        are shared copy-on-write. Nothing here may start threads or open
+        SQLite connections, which do not survive a fork.
+        """
+        self.embedding_model
+        if self.index_backend == "numpy":
+            self.active.collection.count()
+
+    def warm_up(self) -> None:
+        """Load the model, run one encode and open the collection (and lexical index)"""
+        self.embedding_model.encode(["warm-up"])
+        self.active.collection.count()
+
+    @property
+    def chunker(self) -> TextChunker:
+        """Sentence-aware chunker measured with the embedding model's tokenizer"""
+        if self._chunker is None:
+            with self._init_lock:
+                if self._chunker is None:
+                    model = self.embedding_model
+                    # Leave room for the [CLS]/[SEP] tokens so nothing is truncated
+                    max_tokens = min(self.chunk_tokens, model.max_seq_length - 2)
+                    self._chunker = TextChunker(model.count_tokens, max_tokens, self.chunk_overlap_tokens)
+        return self._chunker
+
+    def iter_chunks(self, text: TextStream) -> Iterator[str]:
+        """Yield chunks from text or a stream of text pieces (e.g. an open file)"""
+        return self.chunker.chunks(text)
 
     def chunk_text(self, text: str) -> List[str]:
-        """Split text into chunks with overlap"""
-        chunks = []
-        start = 0
-        text_length = len(text)
+        """Split text into token-budgeted chunks at sentence boundaries"""
+        return list(self.iter_chunks(text))
 
-        while start < text_length:
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start += self.chunk_size - self.chunk_overlap
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-        return chunks
+    @staticmethod
+    def _chunk_id(source: str, chunk_hash: str, occurrence: int) -> str:
+        # Deterministic: the same chunk of the same source always gets the
+        # same id, so re-ingestion upserts instead of duplicating.
+        return hashlib.sha256(f"{source}\x00{chunk_hash}\x00{occurrence}".encode("utf-8")).hexdigest()[:32]
 
     def add_document(self, text: str, filename: str) -> int:
-        """Add a document to the RAG system"""
-        chunks = self.chunk_text(text)
+        """Add a document to the RAG system; returns the number of chunks embedded"""
+        return self.upsert_document(text, filename).chunks_written
 
-        if not chunks:
-            logger.warning("No chunks created for %s", filename)
-            return 0
+    def upsert_document(self, text: str, source: str, progress: Optional[Progress] = None) -> IngestResult:
+        """Add or refresh a document by content hash (see add_documents)"""
+        return self.add_documents([(text, source)], progress)[0]
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]], progress: Optional[Progress] = None) -> List[IngestResult]:
+        """Add or refresh many (text, source) documents in one pass.
+
+        Unchanged documents (same content hash) are skipped. For changed ones,
+        only chunks whose content is new are embedded; kept chunks get
+        refreshed metadata and chunks that no longer exist are removed. New
+        chunks from every document are encoded together in length-sorted
+        batches and written to the collection in batches of
+        INGEST_WRITE_BATCH_SIZE.
+
+        ``progress("chunks", done, total)`` is called as new chunks are
+        embedded; it must be picklable when writes go to a writer process.
+        """
+        if self.writer is not None:
+            results = self.writer.call("add_documents", list(documents), progress)
+            self._sync_generation()
+            return results
 
-        embeddings = self.embedding_model.encode(chunks).tolist()
+        self._sync_generation()
+        target = self._target()
+        by_source: Dict[str, str] = {}
+        for text, source in documents:
+            if source in by_source:
+                logger.warning("Duplicate source %s in batch; keeping the last copy", source)
+            by_source[source] = text
+        if not by_source:
+            return []
 
-        doc_count = self.collection.count()
-        ids = [f"{filename}_{doc_count}_{i}" for i in range(len(chunks))]
+        existing: Dict[str, Dict[str, Dict]] = {source: {} for source in by_source}
+        sources = list(by_source)
+        for start in range(0, len(sources), self.write_batch_size):
+            found = target.collection.get(
+                where={"source": {"$in": sources[start:start + self.write_batch_size]}}, include=["metadatas"]
+            )
+            for chunk_id, meta in zip(found["ids"], found["metadatas"]):
+                meta = meta or {}
+                existing[meta.get("source")][chunk_id] = meta
 
-        self.collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=[{"source": filename, "chunk": i} for i in range(len(chunks))],
-            ids=ids,
-        )
+        results: Dict[str, IngestResult] = {}
+        new_ids: List[str] = []
+        new_chunks: List[str] = []
+        new_metadatas: List[Dict] = []
+        kept_ids: List[str] = []
+        kept_metadatas: List[Dict] = []
+        stale_ids: List[str] = []
 
-        logger.info("Added %d chunks from %s", len(chunks), filename)
-        return len(chunks)
+        for source, text in by_source.items():
+            source_hash = self._hash(text)
+            current = existing[source]
+            if current and all(meta.get("source_hash") == source_hash for meta in current.values()):
+                logger.info("Skipping unchanged document %s", source)
+                results[source] = IngestResult(source=source, chunks=len(current), unchanged=True)
+                continue
 
-    def query(self, query_text: str, n_results: int = 3) -> List[Dict]:
-        """Query the RAG system for relevant documents"""
-        query_embedding = self.embedding_model.encode([query_text]).tolist()
+            chunks = self.chunk_text(text)
+            if not chunks and not current:
+                logger.warning("No chunks created for %s", source)
+                results[source] = IngestResult(source=source)
+                continue
 
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results,
-        )
+            ids = []
+            occurrences: Dict[str, int] = {}
+            result = IngestResult(source=source, chunks=len(chunks))
+            for i, chunk in enumerate(chunks):
+                chunk_hash = self._hash(chunk)
+                occurrence = occurrences.get(chunk_hash, 0)
+                occurrences[chunk_hash] = occurrence + 1
+                chunk_id = self._chunk_id(source, chunk_hash, occurrence)
+                metadata = {"source": source, "chunk": i, "source_hash": source_hash, "chunk_hash": chunk_hash}
+                ids.append(chunk_id)
+                if chunk_id in current:
+                    kept_ids.append(chunk_id)
+                    kept_metadatas.append(metadata)
+                else:
+                    new_ids.append(chunk_id)
+                    new_chunks.append(chunk)
+                    new_metadatas.append(metadata)
+                    result.chunks_written += 1
+            stale = sorted(set(current) - set(ids))
+            stale_ids.extend(stale)
+            result.chunks_removed = len(stale)
+            results[source] = result
+
+        # Open (or build) the lexical index before the collection changes
+        lexical_index = target.lexical_index
+
+        if new_chunks:
+            embeddings = self._encode_documents(new_chunks, progress)
+            for start in range(0, len(new_ids), self.write_batch_size):
+                end = start + self.write_batch_size
+                target.collection.upsert(
+                    embeddings=embeddings[start:end],
+                    documents=new_chunks[start:end],
+                    metadatas=new_metadatas[start:end],
+                    ids=new_ids[start:end],
+                )
+        for start in range(0, len(kept_ids), self.write_batch_size):
+            end = start + self.write_batch_size
+            target.collection.update(ids=kept_ids[start:end], metadatas=kept_metadatas[start:end])
+        for start in range(0, len(stale_ids), self.write_batch_size):
+            target.collection.delete(ids=stale_ids[start:start + self.write_batch_size])
+
+        if lexical_index is not None and (new_ids or stale_ids):
+            lexical_index.remove(stale_ids)
+            lexical_index.add(new_ids, new_chunks)
+            lexical_index.save()
+
+        if new_ids or kept_ids or stale_ids:
+            self._written(target)
+        changed = [result for result in results.values() if not result.unchanged]
+        logger.info("Ingested %d documents (%d unchanged): %d chunks embedded, %d kept, %d removed",
+                    len(changed), len(results) - len(changed), len(new_ids), len(kept_ids), len(stale_ids))
+        return [results[source] for source in by_source]
+
+    def ingest_file(self, path: str, kind: str, source: str, progress: Optional[Progress] = None) -> IngestResult:
+        """Add or refresh one document from a file, streaming it through extract, chunk, embed and write.
+
+        Each stage runs in its own thread with at most INGEST_PIPELINE_DEPTH
+        items queued before the next: PDF pages become chunks as they are
+        extracted, new chunks are embedded in batches of EMBED_BATCH_SIZE and
+        committed every INGEST_WRITE_BATCH_SIZE chunks. Memory stays flat and
+        wall time tracks the slowest stage. A file whose bytes are unchanged
+        since it was last ingested is skipped before extraction; otherwise,
+        as in add_documents, only chunks with new content are embedded.
+        """
+        if self.writer is not None:
+            result = self.writer.call("ingest_file", str(path), kind, source, progress)
+            self._sync_generation()
+            return result
+
+        self._sync_generation()
+        target = self._target()
+        source_hash = self._file_hash(path)
+        found = target.collection.get(where={"source": source}, include=["metadatas"])
+        current = {chunk_id: meta or {} for chunk_id, meta in zip(found["ids"], found["metadatas"])}
+        if current and all(meta.get("source_hash") == source_hash for meta in current.values()):
+            logger.info("Skipping unchanged document %s", source)
+            return IngestResult(source=source, chunks=len(current), unchanged=True)
+
+        result = IngestResult(source=source)
+        seen = set()
+        kept: List[Tuple[str, Dict]] = []
+
+        def chunk_batches() -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+            occurrences: Dict[str, int] = {}
+            batch: Tuple[List[str], List[str], List[Dict]] = ([], [], [])
+            for i, chunk in enumerate(self.iter_chunks(self._iter_file_text(path, kind, progress))):
+                chunk_hash = self._hash(chunk)
+                occurrence = occurrences.get(chunk_hash, 0)
+                occurrences[chunk_hash] = occurrence + 1
+                chunk_id = self._chunk_id(source, chunk_hash, occurrence)
+                metadata = {"source": source, "chunk": i, "source_hash": source_hash, "chunk_hash": chunk_hash}
+                result.chunks += 1
+                seen.add(chunk_id)
+                if chunk_id in current:
+                    kept.append((chunk_id, metadata))
+                    continue
+                for column, value in zip(batch, (chunk_id, chunk, metadata)):
+                    column.append(value)
+                if len(batch[0]) >= self.encode_batch_size:
+                    yield batch
+                    batch = ([], [], [])
+            if batch[0]:
+                yield batch
+
+        def embedded_batches() -> Iterator[Tuple[List[str], List[str], List[Dict], List[List[float]]]]:
+            for ids, chunks, metadatas in threaded(chunk_batches(), self.pipeline_depth, "ingest-chunk"):
+                yield ids, chunks, metadatas, self._encode_documents(chunks)
+
+        # Open (or build) the lexical index before the collection changes
+        lexical_index = target.lexical_index
+        pending: Tuple[List, List, List, List] = ([], [], [], [])
+
+        def commit() -> None:
+            ids, chunks, metadatas, embeddings = pending
+            target.collection.upsert(embeddings=embeddings, documents=chunks, metadatas=metadatas, ids=ids)
+            if lexical_index is not None:
+                lexical_index.add(ids, chunks)
+            result.chunks_written += len(ids)
+            for column in pending:
+                column.clear()
+            if progress is not None:
+                progress("chunks", result.chunks_written, None)
+
+        for batch in threaded(embedded_batches(), self.pipeline_depth, "ingest-embed"):
+            for column, values in zip(pending, batch):
+                column.extend(values)
+            if len(pending[0]) >= self.write_batch_size:
+                commit()
+        if pending[0]:
+            commit()
+
+        for start in range(0, len(kept), self.write_batch_size):
+            batch = kept[start:start + self.write_batch_size]
+            target.collection.update(ids=[chunk_id for chunk_id, _ in batch], metadatas=[meta for _, meta in batch])
+        stale = sorted(set(current) - seen)
+        for start in range(0, len(stale), self.write_batch_size):
+            target.collection.delete(ids=stale[start:start + self.write_batch_size])
+        result.chunks_removed = len(stale)
+
+        if lexical_index is not None and (result.chunks_written or stale):
+            lexical_index.remove(stale)
+            lexical_index.save()
+        if result.chunks_written or kept or stale:
+            self._written(target)
+        if progress is not None:
+            progress("chunks", result.chunks_written, result.chunks_written)
+        logger.info("Ingested %s: %d chunks embedded, %d kept, %d removed",
+                    source, result.chunks_written, len(kept), len(stale))
+        return result
+
+    def _iter_file_text(self, path: str, kind: str, progress: Optional[Progress]) -> Iterator[str]:
+        """Stream a file's text: PDFs page by page, plain text in 64 KiB pieces"""
+        if kind == "pdf":
+            on_pages = (lambda done, total: progress("pages", done, total)) if progress is not None else None
+            for page in iter_pdf_pages(path, self.page_batch, self.pipeline_depth, on_pages):
+                page = sanitize_text(page)
+                if page:
+                    yield page + "\n\n"
+        elif kind == "txt":
+            with open(path, encoding="utf-8", errors="replace", newline="") as handle:
+                yield from iter(lambda: handle.read(65536), "")
+        else:
+            yield extract_file(path, kind)
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _encode_documents(self, chunks: List[str], progress: Optional[Progress] = None) -> List[List[float]]:
+        """Encode chunks longest-first so each batch pads to similar lengths"""
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]), reverse=True)
+        embeddings: List[Optional[List[float]]] = [None] * len(chunks)
+        started = time.perf_counter()
+        for start in range(0, len(order), self.encode_batch_size):
+            batch = order[start:start + self.encode_batch_size]
+            vectors = self.embedding_model.encode([chunks[i] for i in batch], batch_size=self.encode_batch_size)
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector.tolist()
+            if progress is not None:
+                progress("chunks", start + len(batch), len(chunks))
+        self.stage_timings.record("ingest_embed", time.perf_counter() - started)
+        return embeddings
+
+    @staticmethod
+    def _normalize_query(query_text: str) -> str:
+        # The MiniLM tokenizer is uncased and ignores runs of whitespace, so
+        # these variants map to the same embedding.
+        return " ".join(query_text.lower().split())
+
+    def embed_query(self, query_text: str) -> List[float]:
+        """Return the (cached) embedding for a query"""
+        key = self._normalize_query(query_text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            started = time.perf_counter()
+            if self.embedding_batcher:
+                embedding = self.embedding_batcher.encode(query_text)
+            else:
+                embedding = self.embedding_model.encode([query_text])[0].tolist()
+            self.stage_timings.record("embed", time.perf_counter() - started)
+            self.embedding_cache.set(key, embedding)
+        return embedding
+
+    def query(self, query_text: str, n_results: int = 3, query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Query the RAG system for relevant documents, optionally with the query already embedded"""
+        self._sync_generation()
+        version = self.active  # this query reads one version throughout
+        cache_key = (version.name, self._normalize_query(query_text), n_results)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return [dict(source) for source in cached]
+
+        if query_embedding is None:
+            query_embedding = self.embed_query(query_text)
+
+        sources = self._search([query_text], [query_embedding], n_results, version)[0]
+        self.result_cache.set(cache_key, sources)
+        return [dict(source) for source in sources]
+
+    def query_many(self, query_texts: List[str], n_results: int = 3) -> List[List[Dict]]:
+        """Query several texts with one batched encode and one collection query.
+
+        Returns one list of sources per input text, in the same shape as query().
+        """
+        self._sync_generation()
+        version = self.active  # this query reads one version throughout
+        keys = [self._normalize_query(text) for text in query_texts]
+        results: List[Optional[List[Dict]]] = [self.result_cache.get((version.name, key, n_results)) for key in keys]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+
+        if pending:
+            embeddings: Dict[str, List[float]] = {}
+            to_encode: Dict[str, str] = {}
+            for i in pending:
+                embedding = self.embedding_cache.get(keys[i])
+                if embedding is None:
+                    to_encode.setdefault(keys[i], query_texts[i])
+                else:
+                    embeddings[keys[i]] = embedding
+            if to_encode:
+                started = time.perf_counter()
+                vectors = self.embedding_model.encode(list(to_encode.values()))
+                self.stage_timings.record("embed", time.perf_counter() - started)
+                for key, vector in zip(to_encode, vectors):
+                    embeddings[key] = vector.tolist()
+                    self.embedding_cache.set(key, embeddings[key])
+
+            unique_keys = list(dict.fromkeys(keys[i] for i in pending))
+            texts = {keys[i]: query_texts[i] for i in pending}
+            batch = self._search([texts[key] for key in unique_keys], [embeddings[key] for key in unique_keys], n_results, version)
+            by_key = dict(zip(unique_keys, batch))
+            for key, sources in by_key.items():
+                self.result_cache.set((version.name, key, n_results), sources)
+            for i in pending:
+                results[i] = by_key[keys[i]]
+
+        return [[dict(source) for source in sources] for sources in results]
+
+    def _search(self, query_texts: List[str], query_embeddings: List[List[float]], n_results: int,
+                version: IndexVersion) -> List[List[Dict]]:
+        """Dense search for each query, fused with BM25 results when hybrid search is on"""
+        started = time.perf_counter()
+        if not self.hybrid_search:
+            results = version.collection.query(query_embeddings=query_embeddings, n_results=n_results)
+            self.stage_timings.record("dense", time.perf_counter() - started)
+            return [self._format_results(results, row) for row in range(len(query_texts))]
+
+        candidates = n_results * self.hybrid_candidates
+        dense = version.collection.query(query_embeddings=query_embeddings, n_results=candidates)
+        self.stage_timings.record("dense", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        lexical = [version.lexical_index.search(text, candidates) for text in query_texts]
+        self.stage_timings.record("lexical", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        dense_rows = []
+        ranked_rows = []
+        missing = set()
+        for row in range(len(query_texts)):
+            dense_ids = dense["ids"][row]
+            dense_rows.append(dict(zip(dense_ids, self._format_results(dense, row))))
+            ranked = self._reciprocal_rank_fusion([dense_ids, [doc_id for doc_id, _ in lexical[row]]])[:n_results]
+            ranked_rows.append(ranked)
+            missing.update(doc_id for doc_id in ranked if doc_id not in dense_rows[row])
+
+        # Lexical-only hits: fetch them and compute the same squared-L2 distance
+        # the dense search reports.
+        extra = {}
+        if missing:
+            fetched = version.collection.get(ids=list(missing), include=["documents", "metadatas", "embeddings"])
+            for doc_id, doc, meta, embedding in zip(
+                fetched["ids"], fetched["documents"], fetched["metadatas"], fetched["embeddings"]
+            ):
+                extra[doc_id] = (doc, meta or {}, np.asarray(embedding, dtype=np.float32))
+
+        fused = []
+        for row, ranked in enumerate(ranked_rows):
+            query_vector = np.asarray(query_embeddings[row], dtype=np.float32)
+            sources = []
+            for doc_id in ranked:
+                if doc_id in dense_rows[row]:
+                    sources.append(dense_rows[row][doc_id])
+                elif doc_id in extra:
+                    doc, meta, embedding = extra[doc_id]
+                    sources.append(
+                        {
+                            "text": doc,
+                            "source": meta.get("source", "unknown"),
+                            "chunk": meta.get("chunk", 0),
+                            "distance": float(np.sum((embedding - query_vector) ** 2)),
+                        }
+                    )
+            fused.append(sources)
+        self.stage_timings.record("fusion", time.perf_counter() - started)
+        return fused
+
+    def _reciprocal_rank_fusion(self, rankings: List[List[str]]) -> List[str]:
+        scores: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, doc_id in enumerate(ranking):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        return sorted(scores, key=scores.get, reverse=True)
+
+    @staticmethod
+    def _format_results(results: Dict, row: int) -> List[Dict]:
+        def row_of(key: str) -> List:
+            values = results.get(key) or []
+            return (values[row] or []) if len(values) > row else []
 
         sources = []
-        if results.get("documents") and len(results["documents"]) > 0:
-            docs = results["documents"][0]
-            metas = results.get("metadatas", [[]])[0]
-            distances = results.get("distances", [[]])[0]
+        docs = row_of("documents")
+        if docs:
+            metas = row_of("metadatas")
+            distances = row_of("distances")
             for i, doc in enumerate(docs):
                 meta = metas[i] if i < len(metas) else {}
                 sources.append(
@@ -103,22 +881,190 @@ class RAGService:
                         "distance": distances[i] if i < len(distances) else None,
                     }
                 )
-
         return sources
 
+    @staticmethod
+    def _file_stamp(path: Path) -> Optional[tuple]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _written(self, target: IndexVersion) -> None:
+        """Invalidate readers after a write, unless it went to a shadow nobody reads yet"""
+        if target is not self._building:
+            self.result_cache.clear()
+            self._bump_generation()
+
+    def _bump_generation(self) -> None:
+        """Tell other processes the collection changed"""
+        self.generation_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.generation_path.with_name(self.generation_path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(str(time.time_ns()), encoding="utf-8")
+        os.replace(tmp, self.generation_path)
+        self._generation_stamp = self._file_stamp(self.generation_path)
+
+    def _sync_generation(self) -> None:
+        """Drop cached results, follow an alias switch and reopen Chroma if another process wrote to the index"""
+        stamp = self._file_stamp(self.generation_path)
+        if stamp == self._generation_stamp:
+            return
+        with self._init_lock:
+            if stamp == self._generation_stamp:
+                return
+            self._generation_stamp = stamp
+            self.result_cache.clear()
+            if self._active is not None and self._active.name != self._read_alias()["collection"]:
+                # A rebuild switched the alias; queries already running keep the old version
+                self._active = None
+            if self.index_backend == "chroma" and self._client is not None and self._building is None:
+                # Chroma keeps the HNSW index in memory; swap in a client that loads the new one
+                self._forget_chroma_system()
+                self._client = None
+                self._active = None
+            logger.info("Collection %s changed in another process; reloaded", self.collection_name)
+
+    def _forget_chroma_system(self) -> None:
+        """Drop this index's system from Chroma's shared cache, so the next client reads it from disk.
+
+        Unlike SharedSystemClient.clear_system_cache() this leaves other
+        systems alone, and it does not stop the old one: queries still running
+        hold their collection, which keeps using it until they finish.
+        """
+        try:
+            from chromadb.api.client import SharedSystemClient
+        except ImportError:
+            return
+        systems = getattr(SharedSystemClient, "_identifier_to_system", None)
+        if systems is None:
+            systems = getattr(SharedSystemClient, "_identifer_to_system", None)  # chromadb < 0.5
+        identifier = getattr(self._client, "_identifier", None)
+        if systems is not None and identifier is not None:
+            systems.pop(identifier, None)
+
     def get_document_count(self) -> int:
         """Get the number of documents in the collection"""
-        return self.collection.count()
+        self._sync_generation()
+        return self.active.collection.count()
 
     def clear_collection(self):
-        """Clear all documents from the collection"""
-        try:
-            self.client.delete_collection(name=self.collection_name)
-        except Exception:
-            logger.info("Collection %s not found; creating a new one.", self.collection_name)
-        self.collection = self.client.create_collection(name=self.collection_name)
+        """Switch the alias to a new, empty version; queries never see a half-cleared index"""
+        if self.writer is not None:
+            self.writer.call("clear_collection")
+            self._sync_generation()
+            return
+        with self.rebuild():
+            pass
         logger.info("Cleared collection: %s", self.collection_name)
 
+    def list_sources(self) -> List[Dict]:
+        """Every source in the collection with its chunk count, read in pages of INGEST_WRITE_BATCH_SIZE"""
+        self._sync_generation()
+        counts: Dict[str, int] = {}
+        offset = 0
+        while True:
+            page = self.active.collection.get(include=["metadatas"], limit=self.write_batch_size, offset=offset)
+            for meta in page["metadatas"]:
+                source = (meta or {}).get("source", "Unknown")
+                counts[source] = counts.get(source, 0) + 1
+            if len(page["ids"]) < self.write_batch_size:
+                break
+            offset += self.write_batch_size
+        return [{"source": source, "chunks": chunks} for source, chunks in sorted(counts.items())]
+
+    def delete_source(self, source: str) -> int:
+        """Remove one source's chunks with a metadata-filtered delete; returns the number removed"""
+        if self.writer is not None:
+            removed = self.writer.call("delete_source", source)
+            self._sync_generation()
+            return removed
+        self._sync_generation()
+        target = self._target()
+        ids = target.collection.get(where={"source": source}, include=[])["ids"]
+        if not ids:
+            return 0
+        # Open (or build) the lexical index before the collection changes
+        lexical_index = target.lexical_index
+        target.collection.delete(where={"source": source})
+        if lexical_index is not None:
+            lexical_index.remove(ids)
+            lexical_index.save()
+        self._written(target)
+        logger.info("Deleted %s (%d chunks)", source, len(ids))
+        return len(ids)
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Hit/miss counters for the query caches and embedding batcher"""
+        return {
+            "embeddings": self.embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+            "batcher": self.embedding_batcher.stats() if self.embedding_batcher else None,
+        }
+
+    def timing_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage retrieval latency (embed, dense, lexical, fusion)"""
+        return self.stage_timings.stats()
+
+    async def _run_in_executor(self, func: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def awarm_up(self) -> None:
+        """Run warm_up() on the RAG executor without blocking the event loop"""
+        await self._run_in_executor(self.warm_up)
+
+    async def aquery(self, query_text: str, n_results: int = 3) -> List[Dict]:
+        """Run query() on the RAG executor without blocking the event loop"""
+        if not self.embedding_batcher:
+            return await self._run_in_executor(self.query, query_text, n_results)
+        # Embed first so no executor thread sits waiting for the batch to fill
+        query_embedding = await self.aembed_query(query_text)
+        return await self._run_in_executor(self.query, query_text, n_results, query_embedding)
+
+    async def aquery_many(self, query_texts: List[str], n_results: int = 3) -> List[List[Dict]]:
+        """Run query_many() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.query_many, query_texts, n_results)
+
+    async def aembed_query(self, query_text: str) -> List[float]:
+        """embed_query() without blocking the event loop; batched queries hold no executor thread"""
+        if not self.embedding_batcher:
+            return await self._run_in_executor(self.embed_query, query_text)
+        key = self._normalize_query(query_text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            started = time.perf_counter()
+            embedding = await asyncio.wrap_future(self.embedding_batcher.submit(query_text))
+            self.stage_timings.record("embed", time.perf_counter() - started)
+            self.embedding_cache.set(key, embedding)
+        return embedding
+
+    async def aingest_file(self, path: str, kind: str, source: str, progress: Optional[Progress] = None) -> IngestResult:
+        """Run ingest_file() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.ingest_file, path, kind, source, progress)
+
+    async def aget_document_count(self) -> int:
+        """Run get_document_count() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.get_document_count)
+
+    async def aindex_stats(self) -> Dict:
+        """Run index_stats() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.index_stats)
+
+    async def alist_sources(self) -> List[Dict]:
+        """Run list_sources() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.list_sources)
 
+    async def adelete_source(self, source: str) -> int:
+        """Run delete_source() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.delete_source, source)
 
+    async def aclear_collection(self):
+        """Run clear_collection() on the RAG executor without blocking the event loop"""
+        return await self._run_in_executor(self.clear_collection)
 
+    def shutdown(self):
+        """Stop the RAG executor and embedding batcher"""
+        self.executor.shutdown(wait=False)
+        if self.embedding_batcher:
+            self.embedding_batcher.close()
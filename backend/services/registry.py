@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from backend.services.chat_service import ChatService
+from backend.services.extraction import shutdown_pool
+from backend.services.ingest_jobs import IngestJobManager
+from backend.services.rag_service import RAGService
+from backend.services.session_store import SessionStore, create_session_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Owns the service instances for the app lifespan and tracks background warm-up"""
+
+    def __init__(self):
+        # Set by the pre-fork launcher so workers reuse the parent's loaded model
+        self.preloaded_rag: Optional[RAGService] = None
+        self.rag: Optional[RAGService] = None
+        self.chat: Optional[ChatService] = None
+        self.sessions: Optional[SessionStore] = None
+        self.jobs: Optional[IngestJobManager] = None
+        self.ready = False
+        self.warmup_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._connection_warmup_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Construct the services and start warming them up in the background"""
+        self.rag = self.preloaded_rag or RAGService()
+        self.chat = ChatService()
+        self.sessions = create_session_store(os.environ)
+        self.jobs = IngestJobManager.from_env(os.environ, self.rag)
+        self.jobs.start()
+        self._warmup_task = asyncio.create_task(self._warm_up())
+        # Provider connections open alongside the model load; failures are
+        # logged by ChatService and do not affect readiness
+        self._connection_warmup_task = asyncio.create_task(self.chat.awarm_up())
+
+    async def _warm_up(self) -> None:
+        started = time.perf_counter()
+        try:
+            await self.rag.awarm_up()
+        except Exception as exc:  # noqa: BLE001
+            self.warmup_error = str(exc)
+            logger.error("Service warm-up failed: %s", exc)
+            return
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        self.ready = True
+        logger.info("Services ready after %.2fs warm-up", self.warmup_seconds)
+
+    async def stop(self) -> None:
+        """Stop ingestion jobs and release executor threads and provider connections"""
+        for task in (self._warmup_task, self._connection_warmup_task):
+            if task and not task.done():
+                task.cancel()
+        if self.jobs:
+            await self.jobs.aclose()
+        if self.rag:
+            self.rag.shutdown()
+        if self.chat:
+            await self.chat.aclose()
+        if self.sessions:
+            self.sessions.close()
+        shutdown_pool()
+        self.ready = False
+
+    def status(self) -> Dict:
+        """Readiness details for the /ready probe"""
+        if self.ready:
+            status = "ready"
+        elif self.warmup_error:
+            status = "failed"
+        else:
+            status = "warming_up"
+        return {
+            "ready": self.ready,
+            "status": status,
+            "detail": self.warmup_error,
+            "warmup_seconds": self.warmup_seconds,
+        }
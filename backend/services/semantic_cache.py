@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+_PURGE_INTERVAL = 60.0
+
+
+def source_set_key(sources: Optional[Iterable[Dict]]) -> str:
+    """Order-independent key for the set of retrieved chunks and their text.
+
+    The text is part of the key so answers built from a document that has
+    since been re-ingested or replaced are not served again.
+    """
+    if not sources:
+        return ""
+    digest = hashlib.sha256()
+    for item in sorted(
+        f"{item.get('source', 'unknown')}#{item.get('chunk', 0)}\x00{item.get('text', '')}" for item in sources
+    ):
+        digest.update(item.encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+class SemanticCache:
+    """Answer cache matched on query-embedding similarity within (language, grade level, source set).
+
+    Entries live in memory for lookups; when ``path`` is given they are also
+    written through to SQLite and reloaded on startup so the cache survives
+    restarts.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: Optional[float] = 86400,
+        maxsize: int = 1000,
+        path: Optional[str] = None,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.maxsize = maxsize
+        self.path = Path(path).resolve() if path else None
+        self._lock = threading.Lock()
+        # (language, grade_level, source_key) -> {entry_id: entry}
+        self._partitions: Dict[Tuple[str, str, str], Dict[str, Dict]] = {}
+        self._count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._last_purge = 0.0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS semantic_cache (
+                    id TEXT PRIMARY KEY,
+                    language TEXT NOT NULL,
+                    grade_level TEXT NOT NULL,
+                    source_key TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    response TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self._db.commit()
+            self._load()
+
+    @classmethod
+    def from_env(cls, env: Dict[str, str]) -> Optional["SemanticCache"]:
+        """Build a cache from SEMANTIC_CACHE_* settings, or None when disabled"""
+        if env.get("SEMANTIC_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            threshold=float(env.get("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            ttl=float(env.get("SEMANTIC_CACHE_TTL", "86400")),
+            maxsize=int(env.get("SEMANTIC_CACHE_SIZE", "1000")),
+            path=env.get("SEMANTIC_CACHE_PATH") or None,
+        )
+
+    @staticmethod
+    def _normalize(embedding: Iterable[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load(self) -> None:
+        rows = self._db.execute(
+            "SELECT id, language, grade_level, source_key, embedding, response, provider, created_at, last_used "
+            "FROM semantic_cache ORDER BY last_used"
+        ).fetchall()
+        for row in rows:
+            entry_id, language, grade_level, source_key, blob, response, provider, created_at, last_used = row
+            self._insert(
+                (language, grade_level, source_key),
+                {
+                    "id": entry_id,
+                    "embedding": np.frombuffer(blob, dtype=np.float32),
+                    "response": response,
+                    "provider": provider,
+                    "created_at": created_at,
+                    "last_used": last_used,
+                },
+            )
+        self._purge_expired(time.time())
+        self._evict_overflow()
+        self._db.commit()
+        logger.info("Loaded %d semantic cache entries from %s", self._count, self.path)
+
+    def _insert(self, partition: Tuple[str, str, str], entry: Dict) -> None:
+        self._partitions.setdefault(partition, {})[entry["id"]] = entry
+        self._count += 1
+
+    def _remove(self, partition: Tuple[str, str, str], entry_id: str) -> None:
+        entries = self._partitions.get(partition, {})
+        if entries.pop(entry_id, None) is not None:
+            self._count -= 1
+            if not entries:
+                self._partitions.pop(partition, None)
+            if self._db:
+                self._db.execute("DELETE FROM semantic_cache WHERE id = ?", (entry_id,))
+
+    def _purge_expired(self, now: float) -> None:
+        if not self.ttl:
+            return
+        self._last_purge = now
+        for partition, entries in list(self._partitions.items()):
+            for entry_id, entry in list(entries.items()):
+                if entry["created_at"] + self.ttl <= now:
+                    self._remove(partition, entry_id)
+
+    def _evict_overflow(self) -> None:
+        while self._count > self.maxsize:
+            partition, entry = min(
+                ((partition, entry) for partition, entries in self._partitions.items() for entry in entries.values()),
+                key=lambda item: item[1]["last_used"],
+            )
+            self._remove(partition, entry["id"])
+            self.evictions += 1
+
+    def lookup(
+        self,
+        embedding: Iterable[float],
+        language: str,
+        grade_level: str,
+        sources: Optional[List[Dict]],
+    ) -> Optional[Tuple[str, str]]:
+        """Return (response, provider) for a close enough cached query, if any"""
+        partition = (language, grade_level, source_set_key(sources))
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            entries = self._partitions.get(partition)
+            best: Optional[Dict] = None
+            if entries:
+                live = [entry for entry in entries.values() if not self.ttl or entry["created_at"] + self.ttl > now]
+                if live:
+                    scores = np.stack([entry["embedding"] for entry in live]) @ query
+                    index = int(np.argmax(scores))
+                    if scores[index] >= self.threshold:
+                        best = live[index]
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            best["last_used"] = now
+            return best["response"], best["provider"]
+
+    def store(
+        self,
+        embedding: Iterable[float],
+        language: str,
+        grade_level: str,
+        sources: Optional[List[Dict]],
+        response: str,
+        provider: str,
+    ) -> None:
+        """Remember a generated response; blocks on SQLite when persistent, so call it off the event loop"""
+        partition = (language, grade_level, source_set_key(sources))
+        now = time.time()
+        entry = {
+            "id": uuid.uuid4().hex,
+            "embedding": self._normalize(embedding),
+            "response": response,
+            "provider": provider,
+            "created_at": now,
+            "last_used": now,
+        }
+        with self._lock:
+            self._insert(partition, entry)
+            if self._db:
+                self._db.execute(
+                    "INSERT INTO semantic_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry["id"], *partition, entry["embedding"].tobytes(), response, provider, now, now),
+                )
+            if now - self._last_purge >= min(self.ttl or _PURGE_INTERVAL, _PURGE_INTERVAL):
+                self._purge_expired(now)
+            self._evict_overflow()
+            if self._db:
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._count,
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "persistent": bool(self._db),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        """Close the on-disk backend"""
+        if self._db:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from backend.services.cache import TTLCache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MemorySessionStore:
+    """Per-process session profiles with LRU and idle-TTL eviction"""
+
+    backend = "memory"
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = 86400):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, sliding=True)
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict]:
+        """Return the stored profile, or None if unknown or idle too long"""
+        if not session_id:
+            return None
+        return self._cache.get(session_id)
+
+    def set(self, session_id: str, data: Dict) -> None:
+        self._cache.set(session_id, dict(data))
+
+    async def aget(self, session_id: Optional[str]) -> Optional[Dict]:
+        return self.get(session_id)
+
+    async def aset(self, session_id: str, data: Dict) -> None:
+        self.set(session_id, data)
+
+    def delete(self, session_id: str) -> None:
+        self._cache.delete(session_id)
+
+    def stats(self) -> Dict:
+        return dict(self._cache.stats(), backend=self.backend)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSessionStore:
+    """Session profiles in a SQLite (WAL) file shared by the workers on one node.
+
+    Reads are primary-key lookups. ``last_seen`` is only rewritten once an
+    entry has been idle for ``touch_interval`` seconds, so hot sessions do
+    not turn every read into a write. Expired and least recently seen rows
+    beyond ``maxsize`` are pruned every ``prune_every`` writes.
+    """
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 10000,
+        ttl: Optional[float] = 86400,
+        touch_interval: float = 60.0,
+        prune_every: int = 100,
+    ):
+        self.path = Path(path).resolve()
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.touch_interval = touch_interval
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        # Switching to WAL takes an exclusive lock that ignores the busy timeout,
+        # so only do it once (the pre-fork launcher does it before forking)
+        if self._db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                last_seen REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self._db.commit()
+        logger.info("Session store at %s", self.path)
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict]:
+        """Return the stored profile, or None if unknown or idle too long"""
+        if not session_id:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, last_seen FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or (self.ttl and row[1] + self.ttl <= now):
+                self.misses += 1
+                return None
+            self.hits += 1
+            if now - row[1] >= self.touch_interval:
+                self._db.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?", (now, session_id))
+                self._db.commit()
+        return json.loads(row[0])
+
+    def set(self, session_id: str, data: Dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (session_id, data, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, last_seen = excluded.last_seen",
+                (session_id, json.dumps(data), time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+            self._db.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    async def aget(self, session_id: Optional[str]) -> Optional[Dict]:
+        """Run get() off the event loop; it may write and wait on other workers' locks"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, session_id)
+
+    async def aset(self, session_id: str, data: Dict) -> None:
+        """Run set() off the event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.set, session_id, data)
+
+    def _prune(self) -> None:
+        removed = 0
+        if self.ttl:
+            removed += self._db.execute(
+                "DELETE FROM sessions WHERE last_seen <= ?", (time.time() - self.ttl,)
+            ).rowcount
+        removed += self._db.execute(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        ).rowcount
+        self.evictions += removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+SessionStore = Union[MemorySessionStore, SQLiteSessionStore]
+
+
+def create_session_store(env: Dict[str, str]) -> SessionStore:
+    """Build the session store named by SESSION_STORE (memory or sqlite)"""
+    backend = env.get("SESSION_STORE", "memory").lower()
+    maxsize = int(env.get("SESSION_MAX_ENTRIES", "10000"))
+    ttl = float(env.get("SESSION_TTL", "86400"))
+    if backend == "memory":
+        return MemorySessionStore(maxsize=maxsize, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteSessionStore(env.get("SESSION_DB_PATH", "./data/sessions.db"), maxsize=maxsize, ttl=ttl)
+    raise ValueError(f"Unknown SESSION_STORE '{backend}'. Use 'memory' or 'sqlite'.")
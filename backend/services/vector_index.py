@@ -0,0 +1,420 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+_REFRESH_ATTEMPTS = 3
+
+
+def _matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma-style metadata filter ({key: value}, $eq/$ne/$in/$nin, $and/$or)"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyCollection:
+    """Exact-search collection: normalized float32 vectors in a memory-mapped .npy file.
+
+    Implements the subset of the Chroma collection API that RAGService uses
+    (add, upsert, update, get, delete, query, count), so it can stand in for
+    a Chroma collection. Top-k is one matrix product plus ``argpartition``;
+    distances are squared L2 (``2 - 2 * cosine`` for unit vectors), the same
+    metric Chroma reports by default.
+
+    Vectors live in a raw ``embeddings-G.f32`` file and records in a JSON
+    lines ``records-G.jsonl`` file; ``manifest.json`` names the current file
+    pair and how many rows and bytes of it are published. Adding new ids
+    appends to both files and then atomically replaces the manifest, so it
+    costs O(added). Updating only documents or metadata writes a new records
+    file next to the unchanged vectors. Replacing or deleting rows compacts
+    into a new pair; the previous files are kept until they are superseded
+    again, for readers that have just read the old manifest. Readers, including other worker processes,
+    pick up changes when the manifest changes, reading only appended records,
+    and they share the vectors through the page cache. Writes must come from
+    a single process.
+    """
+
+    def __init__(self, directory: Path, name: str):
+        self.name = name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._manifest_stamp: Optional[tuple] = None
+        self._version = 0
+        self._file: Optional[int] = None
+        self._records: Optional[int] = None
+        self._records_bytes = 0
+        self._matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._positions: Dict[str, int] = {}
+        if not (self.directory / MANIFEST).exists():
+            self._compact(np.zeros((0, 0), dtype=np.float32), [], [], [])
+        self._refresh()
+
+    # -- persistence -----------------------------------------------------
+
+    def _refresh(self) -> None:
+        """Pick up a version another writer has published"""
+        manifest_path = self.directory / MANIFEST
+        for attempt in range(_REFRESH_ATTEMPTS):
+            try:
+                stat = manifest_path.stat()
+            except FileNotFoundError:
+                return
+            # Every publish replaces the manifest with a new file, so inode plus
+            # mtime identifies a version without reading it.
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stamp == self._manifest_stamp:
+                return
+            with self._lock:
+                try:
+                    self._load(json.loads(manifest_path.read_text(encoding="utf-8")))
+                except FileNotFoundError:
+                    # Compacted twice between reading the manifest and the data files
+                    if attempt == _REFRESH_ATTEMPTS - 1:
+                        raise
+                    continue
+                self._manifest_stamp = stamp
+                return
+
+    def _load(self, manifest: Dict) -> None:
+        version = manifest["version"]
+        if version == self._version and self._manifest_stamp is not None:
+            return
+        if "file" not in manifest:
+            self._load_legacy(manifest)
+            return
+        file, count, dim, records_bytes = manifest["file"], manifest["count"], manifest["dim"], manifest["records_bytes"]
+        records = manifest.get("records", file)
+        appended = (
+            file == self._file
+            and records == self._records
+            and count >= len(self._ids)
+            and records_bytes >= self._records_bytes
+        )
+        offset = self._records_bytes if appended else 0
+        with open(self.directory / f"records-{records}.jsonl", "rb") as records_file:
+            records_file.seek(offset)
+            lines = records_file.read(records_bytes - offset).decode("utf-8").splitlines()
+        matrix = (
+            np.memmap(self.directory / f"embeddings-{file}.f32", dtype=np.float32, mode="r", shape=(count, dim))
+            if count
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        if not appended:
+            self._ids, self._documents, self._metadatas, self._positions = [], [], [], {}
+        # Lists only ever grow in place, so a concurrent query holding the
+        # previous matrix still indexes them correctly.
+        for line in lines:
+            record = json.loads(line)
+            self._positions[record["id"]] = len(self._ids)
+            self._ids.append(record["id"])
+            self._documents.append(record["document"])
+            self._metadatas.append(record["metadata"])
+        self._matrix = matrix
+        self._file = file
+        self._records = records
+        self._records_bytes = records_bytes
+        self._version = version
+
+    def _load_legacy(self, manifest: Dict) -> None:
+        """Read the single-file layout of earlier releases; the next write converts it"""
+        version = manifest["version"]
+        matrix_path = self.directory / f"embeddings-{version}.npy"
+        self._matrix = np.load(matrix_path, mmap_mode="r") if manifest["count"] else np.zeros((0, 0), dtype=np.float32)
+        records = json.loads((self.directory / f"records-{version}.json").read_text(encoding="utf-8"))
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._positions = {item_id: i for i, item_id in enumerate(self._ids)}
+        self._file = None
+        self._records = None
+        self._records_bytes = 0
+        self._version = version
+
+    @staticmethod
+    def _record_lines(ids: List[str], documents: List[str], metadatas: List[Dict]) -> bytes:
+        return "".join(
+            json.dumps({"id": item_id, "document": document, "metadata": metadata}) + "\n"
+            for item_id, document, metadata in zip(ids, documents, metadatas)
+        ).encode("utf-8")
+
+    def _publish(self, file: int, records: int, count: int, dim: int, records_bytes: int) -> None:
+        version = self._version + 1
+        manifest_tmp = self.directory / f"{MANIFEST}.tmp"
+        manifest_tmp.write_text(
+            json.dumps({
+                "version": version, "file": file, "records": records,
+                "count": count, "dim": dim, "records_bytes": records_bytes,
+            }),
+            encoding="utf-8",
+        )
+        os.replace(manifest_tmp, self.directory / MANIFEST)
+        self._manifest_stamp = None
+        self._refresh()
+
+    def _append(self, ids: List[str], vectors: np.ndarray, documents: List[str], metadatas: List[Dict]) -> None:
+        """Append rows for new ids to the current files"""
+        dim = self._matrix.shape[1]
+        if vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {dim}")
+        payload = self._record_lines(ids, documents, metadatas)
+        # Truncate first: a writer that died mid-append may have left unpublished bytes.
+        matrix_bytes = len(self._ids) * dim * 4
+        with open(self.directory / f"embeddings-{self._file}.f32", "r+b") as matrix_file:
+            matrix_file.truncate(matrix_bytes)
+            matrix_file.seek(matrix_bytes)
+            matrix_file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.directory / f"records-{self._records}.jsonl", "r+b") as records_file:
+            records_file.truncate(self._records_bytes)
+            records_file.seek(self._records_bytes)
+            records_file.write(payload)
+        self._publish(self._file, self._records, len(self._ids) + len(ids), dim, self._records_bytes + len(payload))
+
+    def _rewrite_records(self, documents: List[str], metadatas: List[Dict]) -> None:
+        """Publish new records for the current rows, keeping the vectors file"""
+        records = self._version + 1
+        previous = self._records
+        payload = self._record_lines(list(self._ids), documents, metadatas)
+        (self.directory / f"records-{records}.jsonl").write_bytes(payload)
+        self._publish(self._file, records, len(self._ids), self._matrix.shape[1], len(payload))
+        self._remove_stale("records-*", (records, previous))
+
+    def _remove_stale(self, pattern: str, keep) -> None:
+        # Open mappings keep old inodes alive; the previous file stays for
+        # readers that read the old manifest just before the last publish.
+        keep = {str(generation) for generation in keep}
+        for stale in self.directory.glob(pattern):
+            if stale.name.split("-", 1)[1].split(".", 1)[0] not in keep:
+                stale.unlink(missing_ok=True)
+
+    def _compact(self, matrix: np.ndarray, ids: List[str], documents: List[str], metadatas: List[Dict]) -> None:
+        """Write all rows to a new file pair and publish it"""
+        file = self._version + 1
+        previous = self._file if self._file is not None else self._version
+        previous_records = self._records if self._records is not None else self._version
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(self.directory / f"embeddings-{file}.f32")
+        payload = self._record_lines(ids, documents, metadatas)
+        (self.directory / f"records-{file}.jsonl").write_bytes(payload)
+        self._publish(file, file, len(ids), matrix.shape[1] if len(ids) else 0, len(payload))
+        self._remove_stale("embeddings-*", (file, previous))
+        self._remove_stale("records-*", (file, previous_records))
+
+    @staticmethod
+    def _normalize(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.clip(norms, 1e-12, None)
+
+    # -- Chroma-compatible API -------------------------------------------
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._ids)
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        """Append new records; ids that already exist are skipped, as in Chroma"""
+        with self._lock:
+            self._refresh()
+            keep = [i for i, item_id in enumerate(ids) if item_id not in self._positions]
+            if len(keep) < len(ids):
+                logger.warning("Skipping %d existing ids in %s", len(ids) - len(keep), self.name)
+            if not keep:
+                return
+            self._upsert_rows([ids[i] for i in keep], [embeddings[i] for i in keep],
+                              [documents[i] for i in keep], [metadatas[i] for i in keep])
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        """Insert new records and replace existing ones"""
+        with self._lock:
+            self._refresh()
+            self._upsert_rows(list(ids), list(embeddings), list(documents), list(metadatas))
+
+    def _upsert_rows(self, ids, embeddings, documents, metadatas) -> None:
+        vectors = self._normalize(embeddings)
+        last_rows = list({item_id: row for row, item_id in enumerate(ids)}.values())
+        if len(last_rows) < len(ids):
+            # Repeated ids in one call: the last occurrence wins
+            ids, vectors = [ids[row] for row in last_rows], vectors[last_rows]
+            documents, metadatas = [documents[row] for row in last_rows], [metadatas[row] for row in last_rows]
+        if self._ids and self._file is not None and not any(item_id in self._positions for item_id in ids):
+            self._append(ids, vectors, documents, metadatas)
+            return
+        matrix = np.array(self._matrix, dtype=np.float32) if len(self._ids) else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        all_ids, all_docs, all_metas = list(self._ids), list(self._documents), list(self._metadatas)
+        positions = dict(self._positions)
+        appended = []
+        for row, item_id in enumerate(ids):
+            position = positions.get(item_id)
+            if position is None:
+                positions[item_id] = len(all_ids) + len(appended)
+                appended.append(row)
+                continue
+            matrix[position] = vectors[row]
+            all_docs[position] = documents[row]
+            all_metas[position] = metadatas[row]
+        if appended:
+            matrix = np.vstack([matrix, vectors[appended]])
+            all_ids.extend(ids[row] for row in appended)
+            all_docs.extend(documents[row] for row in appended)
+            all_metas.extend(metadatas[row] for row in appended)
+        self._compact(matrix, all_ids, all_docs, all_metas)
+
+    def update(self, ids: List[str], embeddings=None, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict]] = None) -> None:
+        """Update fields of existing records; unknown ids are ignored"""
+        with self._lock:
+            self._refresh()
+            rows = [(row, self._positions[item_id]) for row, item_id in enumerate(ids) if item_id in self._positions]
+            if not rows:
+                return
+            all_docs, all_metas = list(self._documents), list(self._metadatas)
+            for row, position in rows:
+                if documents is not None:
+                    all_docs[position] = documents[row]
+                if metadatas is not None:
+                    all_metas[position] = metadatas[row]
+            if embeddings is None and self._file is not None:
+                self._rewrite_records(all_docs, all_metas)
+                return
+            matrix = np.array(self._matrix, dtype=np.float32)
+            if embeddings is not None:
+                vectors = self._normalize(embeddings)
+                for row, position in rows:
+                    matrix[position] = vectors[row]
+            self._compact(matrix, list(self._ids), all_docs, all_metas)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        """Delete records by id and/or metadata filter"""
+        with self._lock:
+            self._refresh()
+            doomed = set(ids or [])
+            if where:
+                doomed.update(item_id for item_id, meta in zip(self._ids, self._metadatas) if _matches(meta, where))
+            keep = [i for i, item_id in enumerate(self._ids) if item_id not in doomed]
+            if len(keep) == len(self._ids):
+                return
+            matrix = np.array(self._matrix[keep], dtype=np.float32) if keep else np.zeros((0, 0), dtype=np.float32)
+            self._compact(matrix, [self._ids[i] for i in keep], [self._documents[i] for i in keep],
+                        [self._metadatas[i] for i in keep])
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("metadatas", "documents"), limit: Optional[int] = None,
+            offset: int = 0) -> Dict[str, Any]:
+        """Fetch records by id and/or metadata filter"""
+        self._refresh()
+        with self._lock:
+            if ids is not None:
+                rows = [self._positions[item_id] for item_id in ids if item_id in self._positions]
+            else:
+                rows = range(len(self._ids))
+            rows = [i for i in rows if _matches(self._metadatas[i], where)]
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            result: Dict[str, Any] = {"ids": [self._ids[i] for i in rows]}
+            result["documents"] = [self._documents[i] for i in rows] if "documents" in include else None
+            result["metadatas"] = [self._metadatas[i] for i in rows] if "metadatas" in include else None
+            result["embeddings"] = [self._matrix[i].tolist() for i in rows] if "embeddings" in include else None
+            return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """Exact top-k by cosine similarity for each query embedding"""
+        self._refresh()
+        with self._lock:
+            matrix, ids, documents, metadatas = self._matrix, self._ids, self._documents, self._metadatas
+        queries = self._normalize(query_embeddings)
+        result: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not ids:
+            for key in result:
+                result[key] = [[] for _ in range(len(queries))]
+            return result
+
+        candidates = None
+        if where:
+            candidates = np.array([i for i, meta in enumerate(metadatas) if _matches(meta, where)], dtype=np.int64)
+        scores = (matrix if candidates is None else matrix[candidates]) @ queries.T
+        k = min(n_results, scores.shape[0])
+
+        for column in range(queries.shape[0]):
+            column_scores = scores[:, column]
+            if k == 0:
+                top = np.array([], dtype=np.int64)
+            elif k < len(column_scores):
+                top = np.argpartition(-column_scores, k - 1)[:k]
+                top = top[np.argsort(-column_scores[top])]
+            else:
+                top = np.argsort(-column_scores)
+            rows = top if candidates is None else candidates[top]
+            result["ids"].append([ids[i] for i in rows])
+            result["documents"].append([documents[i] for i in rows])
+            result["metadatas"].append([metadatas[i] for i in rows])
+            result["distances"].append([float(2.0 - 2.0 * column_scores[i]) for i in top])
+
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                result[key] = None
+        return result
+
+
+class NumpyVectorStore:
+    """Client for NumpyCollection directories, mirroring chromadb.PersistentClient"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        if not (self.path / name / MANIFEST).exists():
+            raise ValueError(f"Collection {name} does not exist.")
+        return NumpyCollection(self.path / name, name)
+
+    def create_collection(self, name: str) -> NumpyCollection:
+        if (self.path / name / MANIFEST).exists():
+            raise ValueError(f"Collection {name} already exists.")
+        return NumpyCollection(self.path / name, name)
+
+    def get_or_create_collection(self, name: str) -> NumpyCollection:
+        return NumpyCollection(self.path / name, name)
+
+    def delete_collection(self, name: str) -> None:
+        if not (self.path / name).exists():
+            raise ValueError(f"Collection {name} does not exist.")
+        shutil.rmtree(self.path / name)
+
+    def list_collections(self) -> List[NumpyCollection]:
+        return [NumpyCollection(child, child.name) for child in sorted(self.path.iterdir())
+                if (child / MANIFEST).exists()]
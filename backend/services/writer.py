@@ -0,0 +1,76 @@
+import logging
+import signal
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# RAGService methods the writer process will run on behalf of web workers
+WRITE_METHODS = ("add_documents", "ingest_file", "delete_source", "clear_collection")
+
+
+class WriterError(RuntimeError):
+    """A write failed in the writer process"""
+
+
+class WriterClient:
+    """Forwards RAGService writes to the single writer process over a Unix socket"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+
+    def call(self, method: str, *args) -> Any:
+        """Run a write method in the writer process and return its result"""
+        with Client(self.address, family="AF_UNIX", authkey=self.authkey) as conn:
+            conn.send((method, args))
+            status, payload = conn.recv()
+        if status != "ok":
+            raise WriterError(payload)
+        return payload
+
+
+def serve_writer(rag, address: str, authkey: bytes) -> None:
+    """Apply write requests one at a time until SIGTERM/SIGINT (runs in the writer process).
+
+    Requests are handled sequentially, so the collection and lexical index
+    only ever have one writer. A signal that arrives mid-write takes effect
+    once that write has finished.
+    """
+    state = {"busy": False, "stop": False}
+
+    def request_stop(signum, frame):
+        if state["busy"]:
+            state["stop"] = True
+        else:
+            raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    with Listener(address, family="AF_UNIX", backlog=64, authkey=authkey) as listener:
+        logger.info("Index writer listening on %s", address)
+        while not state["stop"]:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as exc:
+                logger.warning("Rejected writer connection: %s", exc)
+                continue
+            with conn:
+                state["busy"] = True
+                try:
+                    method, args = conn.recv()
+                    if method not in WRITE_METHODS:
+                        raise ValueError(f"Unsupported write method: {method}")
+                    conn.send(("ok", getattr(rag, method)(*args)))
+                except Exception as exc:  # noqa: BLE001
+                    logger.error("Write failed: %s", exc)
+                    try:
+                        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+                    except OSError:
+                        pass
+                finally:
+                    state["busy"] = False
+    logger.info("Index writer stopped")
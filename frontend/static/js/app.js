@@ -123,8 +123,8 @@ async function sendMessage() {
     const typingId = addTypingIndicator();
 
     try {
-        // Send to API with language parameter
-        const response = await fetch(`${API_BASE}/chat`, {
+        // Stream from API with language parameter
+        const response = await fetch(`${API_BASE}/chat/stream`, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({
@@ -136,17 +136,25 @@ async function sendMessage() {
             })
         });
 
-        // Remove typing indicator
-        removeTypingIndicator(typingId);
-
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
+            removeTypingIndicator(typingId);
             throw new Error(`HTTP ${response.status}`);
         }
 
-        const data = await response.json();
-
-        // Add bot response (HTML formatted)
-        addMessage("bot", data.response, data.sources);
+        // Render HTML fragments as they arrive
+        let textDiv = null;
+        let html = "";
+        await readEventStream(response, (event, data) => {
+            if (event === "sources") {
+                removeTypingIndicator(typingId);
+                textDiv = addMessage("bot", "", data.sources);
+            } else if (event === "token") {
+                html += data.html;
+                textDiv.innerHTML = html;
+            } else if (event === "error") {
+                throw new Error(data.detail);
+            }
+        });
 
     } catch (error) {
         console.error("Error:", error);
@@ -233,6 +241,35 @@ function addMessage(sender, content, sources = null) {
 
     // NO AUTO-SCROLL - User controls scrolling
     // They can manually scroll to see the response
+
+    return textDiv;
+}
+
+// Read a server-sent event stream, calling onEvent(event, data) per message
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = "message";
+            let data = "";
+            block.split("\n").forEach(line => {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
 }
 
 // Add typing indicator
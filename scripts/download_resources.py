@@ -2,19 +2,22 @@
 """
 Download official Safe Spaces resources and normalize them into plain text files.
 """
+import argparse
 import json
 import logging
-import re
-from io import BytesIO
+import sys
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+from backend.services.extraction import iter_extracted
+
 DATA_FILE = BASE_DIR / "data" / "resources_official.json"
 OUTPUT_DIR = BASE_DIR / "documents" / "official"
 
@@ -37,48 +40,9 @@ def load_resources() -> Dict:
         return json.load(f)
 
 
-def sanitize_text(text: str) -> str:
-    """Collapse whitespace and strip leading/trailing spaces."""
-    text = re.sub(r"\r\n?", "\n", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    text = re.sub(r"[ \t]{2,}", " ", text)
-    return text.strip()
-
-
-def extract_html_text(content: bytes, url: str) -> str:
-    """Parse HTML content and extract readable text."""
-    soup = BeautifulSoup(content, "html.parser")
-
-    # Remove scripts, styles, navs that add noise.
-    for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "form"]):
-        tag.decompose()
-
-    text = soup.get_text(separator="\n")
-    return sanitize_text(text)
-
-
-def extract_pdf_text(content: bytes) -> str:
-    """Extract text from a PDF document."""
-    buffer = BytesIO(content)
-    reader = PdfReader(buffer)
-
-    pages = []
-    for page in reader.pages:
-        try:
-            page_text = page.extract_text() or ""
-            pages.append(page_text)
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("Failed to extract a PDF page: %s", exc)
-
-    combined = "\n\n".join(pages)
-    return sanitize_text(combined)
-
-
-def fetch_resource(resource: Dict) -> None:
-    """Download and store a single resource."""
+def fetch_resource(resource: Dict) -> Optional[Tuple[str, bytes, str]]:
+    """Download a single resource; returns an extraction item keyed by its output name."""
     url = resource["url"]
-    output_name = resource["output"]
-    title = resource["title"]
 
     logger.info("Fetching %s", url)
     try:
@@ -86,36 +50,57 @@ def fetch_resource(resource: Dict) -> None:
         response.raise_for_status()
     except requests.RequestException as exc:
         logger.error("Failed to fetch %s (%s)", url, exc)
-        return
+        return None
 
     content_type = response.headers.get("Content-Type", "").lower()
     parsed_url = urlparse(url)
     suffix = Path(parsed_url.path).suffix.lower()
 
-    if "pdf" in content_type or suffix == ".pdf":
-        text = extract_pdf_text(response.content)
-        extension = ".pdf.txt"
-    else:
-        text = extract_html_text(response.content, url)
-        extension = ".html.txt"
+    kind = "pdf" if "pdf" in content_type or suffix == ".pdf" else "html"
+    return resource["output"], response.content, kind
+
+
+def iter_downloads(resources: List[Dict]) -> Iterator[Tuple[str, bytes, str]]:
+    """Fetch resources one by one, yielding each as soon as it arrives."""
+    for resource in resources:
+        item = fetch_resource(resource)
+        if item is not None:
+            yield item
+
 
+def save_resource(resource: Dict, kind: str, text: str) -> None:
+    """Store extracted text with a title/source header."""
     if not text:
-        logger.warning("No text extracted for %s", url)
+        logger.warning("No text extracted for %s", resource["url"])
         return
 
-    output_file = OUTPUT_DIR / f"{output_name}{extension}"
-    header = f"{title}\nSource: {url}\n\n"
+    extension = ".pdf.txt" if kind == "pdf" else ".html.txt"
+    output_file = OUTPUT_DIR / f"{resource['output']}{extension}"
+    header = f"{resource['title']}\nSource: {resource['url']}\n\n"
 
     output_file.write_text(header + text, encoding="utf-8")
     logger.info("Saved %s (%d characters)", output_file, len(text))
 
 
-def main() -> None:
+def main(workers: Optional[int]) -> None:
     ensure_output_dir()
     resources = load_resources()
-    for resource in resources:
-        fetch_resource(resource)
+    by_output = {resource["output"]: resource for resource in resources}
+    kinds: Dict[str, str] = {}
+
+    def downloads():
+        for output, content, kind in iter_downloads(resources):
+            kinds[output] = kind
+            yield output, content, kind
+
+    # Extraction runs in a process pool while later downloads are still in flight.
+    for output, text in iter_extracted(downloads(), max_workers=workers):
+        save_resource(by_output[output], kinds[output], text)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download official resources and extract their text.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Extraction worker processes (default: EXTRACTION_WORKERS or CPU count).")
+    args = parser.parse_args()
+    main(args.workers)
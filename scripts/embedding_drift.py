@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Report how far the ONNX embedding backend drifts from the torch model on the
+documents/ corpus: per-chunk cosine similarity, nearest-neighbour agreement and
+encode throughput.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+from backend.services.embeddings import create_embedding_backend
+from backend.services.rag_service import RAGService
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+logger = logging.getLogger("embedding_drift")
+
+DEFAULT_DIRECTORIES = [
+    Path("documents/official"),
+    Path("documents"),
+]
+
+
+def load_chunks(paths, limit: int):
+    """Chunk the corpus the same way ingestion does."""
+    rag = RAGService()
+    chunks = []
+    for base in paths:
+        for file_path in sorted(base.glob("*.txt")):
+            with open(file_path, encoding="utf-8") as handle:
+                for chunk in rag.iter_chunks(handle):
+                    chunks.append(chunk)
+                    if len(chunks) >= limit:
+                        return chunks
+    return chunks
+
+
+def timed_encode(backend, chunks, batch_size: int):
+    started = time.perf_counter()
+    vectors = backend.encode(chunks, batch_size=batch_size)
+    return vectors, time.perf_counter() - started
+
+
+def main(model_name: str, limit: int, top_k: int, batch_size: int) -> None:
+    chunks = load_chunks(DEFAULT_DIRECTORIES, limit)
+    if not chunks:
+        logger.error("No documents found under %s", ", ".join(str(p) for p in DEFAULT_DIRECTORIES))
+        return
+    logger.info("Comparing backends on %d chunks", len(chunks))
+
+    torch_vectors, torch_seconds = timed_encode(create_embedding_backend(model_name, "torch"), chunks, batch_size)
+    onnx_vectors, onnx_seconds = timed_encode(create_embedding_backend(model_name, "onnx"), chunks, batch_size)
+
+    cosine = np.sum(torch_vectors * onnx_vectors, axis=1)
+    logger.info("Cosine similarity torch vs onnx: mean %.5f, min %.5f, p1 %.5f, p5 %.5f",
+                cosine.mean(), cosine.min(), np.percentile(cosine, 1), np.percentile(cosine, 5))
+
+    # Use every chunk as a query and compare the top-k neighbour sets.
+    k = min(top_k, len(chunks))
+    torch_top = np.argsort(-(torch_vectors @ torch_vectors.T), axis=1)[:, :k]
+    onnx_top = np.argsort(-(onnx_vectors @ onnx_vectors.T), axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(torch_top, onnx_top)])
+    logger.info("Top-%d neighbour overlap: %.2f%%", k, overlap * 100)
+
+    logger.info("Encode time: torch %.2fs (%.1f chunks/s), onnx %.2fs (%.1f chunks/s)",
+                torch_seconds, len(chunks) / torch_seconds, onnx_seconds, len(chunks) / onnx_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure ONNX embedding drift against the torch model.")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"), help="Sentence-transformer model name.")
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum number of chunks to compare.")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours compared per chunk.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Encode batch size.")
+    args = parser.parse_args()
+    main(args.model, args.limit, args.top_k, args.batch_size)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Export the sentence-transformer embedding model to ONNX and quantize it to int8
+for EMBEDDING_BACKEND=onnx.
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+logger = logging.getLogger("export_onnx_embeddings")
+
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+DEFAULT_OUTPUT = Path(os.getenv("EMBEDDING_ONNX_PATH", "./models/all-MiniLM-L6-v2-int8.onnx"))
+
+
+def export_fp32(model_name: str, output: Path) -> None:
+    """Export the underlying transformer (token embeddings) to ONNX."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    inputs = tuple(sample[name] for name in input_names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            inputs,
+            str(output),
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    logger.info("Exported fp32 model to %s", output)
+
+
+def quantize_int8(source: Path, output: Path) -> None:
+    """Dynamically quantize weights to int8."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(source), str(output), weight_type=QuantType.QInt8)
+    logger.info("Wrote int8 model to %s (%.1f MB -> %.1f MB)", output,
+                source.stat().st_size / 1e6, output.stat().st_size / 1e6)
+
+
+def main(model_name: str, output: Path, keep_fp32: bool) -> None:
+    fp32_path = output.with_name(output.stem + "-fp32.onnx")
+    export_fp32(model_name, fp32_path)
+    quantize_int8(fp32_path, output)
+    if not keep_fp32:
+        fp32_path.unlink()
+    logger.info("Set EMBEDDING_BACKEND=onnx and EMBEDDING_ONNX_PATH=%s to use it.", output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an int8 ONNX embedding model.")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Sentence-transformer model name.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Path of the quantized model.")
+    parser.add_argument("--keep-fp32", action="store_true", help="Keep the intermediate fp32 export.")
+    args = parser.parse_args()
+    main(args.model, args.output, args.keep_fp32)
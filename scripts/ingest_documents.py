@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 """
 Ingest downloaded resources into the ChromaDB collection used by the chatbot.
+
+Re-running is incremental: unchanged documents are skipped and changed ones
+only re-embed the chunks whose content changed. With --rebuild everything is
+embedded into a new index version that the chatbot switches to once it is
+complete, so the running server keeps answering from the old one meanwhile.
 """
 import argparse
 import logging
@@ -11,6 +16,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 if str(BASE_DIR) not in sys.path:
     sys.path.append(str(BASE_DIR))
 
+from backend.services.extraction import detect_kind, iter_extracted
 from backend.services.rag_service import RAGService
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
@@ -22,40 +28,77 @@ DEFAULT_DIRECTORIES = [
 ]
 
 
-def iter_documents(paths):
-    """Yield text content and filenames from provided directories."""
+def iter_document_paths(paths):
+    """Yield supported document files (.txt, .pdf, .html) from provided directories."""
     seen = set()
     for base in paths:
         if not base.exists():
             continue
-        for file_path in sorted(base.glob("*.txt")):
+        for file_path in sorted(base.iterdir()):
+            if not file_path.is_file() or detect_kind(file_path.name) is None:
+                continue
             resolved = file_path.resolve()
             if resolved in seen:
                 continue
             seen.add(resolved)
-            yield file_path.name, file_path.read_text(encoding="utf-8")
+            yield file_path
+
+
+def iter_documents(paths, workers=None):
+    """Yield filenames and extracted text as each file finishes extraction."""
+    return iter_extracted(iter_document_paths(paths), max_workers=workers)
 
 
-def main(clear: bool) -> None:
+def main(rebuild: bool, workers=None, batch_documents: int = 16) -> None:
     rag = RAGService()
-    if clear:
-        logger.info("Clearing existing collection before ingestion.")
-        rag.clear_collection()
+    if rebuild:
+        logger.info("Rebuilding into a new index version; queries use the current one until it is done.")
+        with rag.rebuild():
+            ingest_all(rag, workers, batch_documents)
+    else:
+        ingest_all(rag, workers, batch_documents)
 
+
+def ingest_all(rag: RAGService, workers=None, batch_documents: int = 16) -> None:
     total_chunks = 0
-    for filename, text in iter_documents(DEFAULT_DIRECTORIES):
+    unchanged = 0
+    removed = 0
+
+    def ingest(batch):
+        nonlocal total_chunks, unchanged, removed
+        for result in rag.add_documents(batch):
+            if result.unchanged:
+                unchanged += 1
+                continue
+            total_chunks += result.chunks_written
+            removed += result.chunks_removed
+            logger.info("Ingested %s (%d chunks embedded, %d removed)",
+                        result.source, result.chunks_written, result.chunks_removed)
+
+    # Documents are grouped so their chunks share encode batches and writes
+    batch = []
+    for filename, text in iter_documents(DEFAULT_DIRECTORIES, workers):
         if not text.strip():
             logger.warning("Skipping %s (no text)", filename)
             continue
-        chunks = rag.add_document(text, filename)
-        total_chunks += chunks
-        logger.info("Ingested %s (%d chunks)", filename, chunks)
+        batch.append((text, filename))
+        if len(batch) >= batch_documents:
+            ingest(batch)
+            batch = []
+    if batch:
+        ingest(batch)
 
-    logger.info("Ingestion complete. Total chunks: %d", total_chunks)
+    logger.info("Ingestion complete. Chunks embedded: %d, stale chunks removed: %d, unchanged documents: %d",
+                total_chunks, removed, unchanged)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest text documents into the RAG collection.")
-    parser.add_argument("--clear", action="store_true", help="Clear the existing collection before ingestion.")
+    parser.add_argument("--rebuild", "--clear", dest="rebuild", action="store_true",
+                        help="Re-embed everything into a new index version and switch to it when done.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Extraction worker processes (default: EXTRACTION_WORKERS or CPU count).")
+    parser.add_argument("--batch-documents", type=int, default=16,
+                        help="Documents ingested per bulk add_documents call.")
     args = parser.parse_args()
-    main(clear=args.clear)
+    main(rebuild=args.rebuild, workers=args.workers, batch_documents=args.batch_documents)
@@ -17,29 +17,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
-    """Split text into overlapping chunks."""
-    chunks = []
-    start = 0
-
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-
-        # Try to break at sentence boundary
-        if end < len(text):
-            last_period = chunk.rfind('. ')
-            if last_period > chunk_size // 2:
-                end = start + last_period + 2
-                chunk = text[start:end]
-
-        chunks.append(chunk.strip())
-        start = end - overlap
-
-    return chunks
-
-
-def ingest_rrc_course():
+def ingest_rrc_course(rag_service: RAGService):
     """Ingest RRC Course content into ChromaDB."""
     logger.info("="*60)
     logger.info("Ingesting RRC Course Content")
@@ -56,15 +34,6 @@ def ingest_rrc_course():
 
     logger.info(f"Course content: {len(course_text):,} characters")
 
-    # Split into chunks
-    logger.info("Splitting into chunks...")
-    chunks = chunk_text(course_text, chunk_size=800, overlap=150)
-    logger.info(f"Created {len(chunks)} chunks")
-
-    # Initialize RAG service
-    logger.info("Initializing RAG service...")
-    rag_service = RAGService()
-
     # Add course as a single document (RAGService will chunk it)
     logger.info("Adding RRC Course to database...")
     try:
@@ -79,7 +48,7 @@ def ingest_rrc_course():
     return True
 
 
-def ingest_rrc_references():
+def ingest_rrc_references(rag_service: RAGService):
     """Ingest RRC References into ChromaDB."""
     logger.info("="*60)
     logger.info("Ingesting RRC References")
@@ -102,34 +71,26 @@ def ingest_rrc_references():
 
     logger.info(f"Found {len(references)} references")
 
-    # Initialize RAG service
-    logger.info("Initializing RAG service...")
-    rag_service = RAGService()
-
-    # Add references to database
-    logger.info("Adding references to database...")
-    success_count = 0
-
+    # Name each reference by its domain when it has a URL
+    documents = []
     for i, ref in enumerate(references):
-        try:
-            # Extract source name if possible
-            source_name = f"RRC_Reference_{i+1}"
-            if "http" in ref:
-                # Try to extract domain or meaningful name
-                parts = ref.split('//')
-                if len(parts) > 1:
-                    domain = parts[1].split('/')[0]
-                    source_name = f"RRC_Ref_{i+1}_{domain}"
-
-            # Add each reference as a document
-            chunks_added = rag_service.add_document(ref, source_name)
-            success_count += chunks_added
-
-            if (i+1) % 10 == 0:
-                logger.info(f"Processed {i+1}/{len(references)} references")
-
-        except Exception as e:
-            logger.error(f"Error adding reference {i+1}: {e}")
+        source_name = f"RRC_Reference_{i+1}"
+        if "http" in ref:
+            # Try to extract domain or meaningful name
+            parts = ref.split('//')
+            if len(parts) > 1:
+                domain = parts[1].split('/')[0]
+                source_name = f"RRC_Ref_{i+1}_{domain}"
+        documents.append((ref, source_name))
+
+    # Add all references in one bulk call (batched encode and writes)
+    logger.info("Adding references to database...")
+    try:
+        results = rag_service.add_documents(documents)
+        success_count = sum(result.chunks_written for result in results)
+    except Exception as e:
+        logger.error(f"Error adding references: {e}")
+        return False
 
     logger.info(f"✅ RRC References ingestion: {success_count} chunks added from {len(references)} references")
     return True
@@ -155,11 +116,15 @@ def main():
         logger.info("Please run: python scripts/extract_rrc_references.py")
         return False
 
+    # One service instance (and one model load) for both steps
+    logger.info("Initializing RAG service...")
+    rag_service = RAGService()
+
     # Ingest course content
-    course_success = ingest_rrc_course()
+    course_success = ingest_rrc_course(rag_service)
 
     # Ingest references
-    refs_success = ingest_rrc_references()
+    refs_success = ingest_rrc_references(rag_service)
 
     # Summary
     logger.info("\n" + "="*60)
@@ -0,0 +1,61 @@
+"""
+Shared fixtures: a RAGService on the numpy index with a small deterministic embedding model
+"""
+import hashlib
+
+import numpy as np
+import pytest
+
+
+class HashingModel:
+    """Bag-of-words embedding model: each word adds to one of ``dim`` hashed axes"""
+
+    max_seq_length = 256
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        self.encoded += len(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.strip(".,").encode()).hexdigest(), 16) % self.dim] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+@pytest.fixture
+def model():
+    return HashingModel()
+
+
+@pytest.fixture
+def make_rag(tmp_path, monkeypatch, model):
+    """Build RAGServices sharing one index directory and embedding model"""
+    from backend.services import rag_service
+
+    monkeypatch.setenv("INDEX_BACKEND", "numpy")
+    monkeypatch.setenv("NUMPY_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setenv("CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setenv("EMBED_BATCH_MAX_SIZE", "1")
+    monkeypatch.setattr(rag_service, "create_embedding_backend", lambda *args, **kwargs: model)
+    services = []
+
+    def make():
+        service = rag_service.RAGService()
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.shutdown()
+
+
+@pytest.fixture
+def rag(make_rag):
+    return make_rag()
@@ -0,0 +1,91 @@
+"""
+Unit tests for per-provider admission control and the 429 it maps to
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routes import api
+from backend.services.admission import AdmissionRejected, ProviderLimiter
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        limiter = ProviderLimiter("xai", max_concurrency=1, max_queue=1, max_wait=5)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire()
+        limiter.release()
+        await waiter
+        return limiter, rejected.value
+
+    limiter, error = asyncio.run(scenario())
+    assert error.reason == "queue full"
+    assert error.retry_after >= 1
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["admitted"] == 2
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        limiter = ProviderLimiter("xai", max_concurrency=1, max_queue=4, max_wait=0.01)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire()
+        return limiter, rejected.value
+
+    limiter, error = asyncio.run(scenario())
+    assert error.reason == "queue wait exceeded"
+    assert limiter.stats()["timed_out"] == 1
+    assert limiter.stats()["queue_depth"] == 0
+
+
+def test_released_slot_goes_to_oldest_waiter():
+    async def scenario():
+        limiter = ProviderLimiter("xai", max_concurrency=1, max_queue=4, max_wait=5)
+        order = []
+
+        async def worker(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(worker(name) for name in "abc"))
+        return limiter, order
+
+    limiter, order = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert limiter.in_flight == 0
+
+
+class BusyRag:
+    async def aquery(self, query_text, n_results=3):
+        return []
+
+
+class BusyChat:
+    semantic_cache = None
+
+    async def generate_response(self, **kwargs):
+        raise AdmissionRejected("xai", "queue full", 7)
+
+
+class Sessions:
+    async def aget(self, session_id):
+        return {}
+
+
+def test_chat_returns_429_when_not_admitted(monkeypatch):
+    monkeypatch.setattr(api.services, "rag", BusyRag())
+    monkeypatch.setattr(api.services, "chat", BusyChat())
+    monkeypatch.setattr(api.services, "sessions", Sessions())
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+
+    response = TestClient(app).post("/api/chat", json={"message": "hello", "session_id": "s"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
@@ -0,0 +1,54 @@
+"""
+Unit tests for the sentence-aware token chunker
+"""
+from backend.services.chunker import TextChunker, iter_sentences
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def char_tokens(text):
+    return max(1, (len(text) + 3) // 4)
+
+
+TEXT = "\n\n".join(
+    " ".join(f"Paragraph {p} sentence {s} has a few words." for s in range(12)) for p in range(5)
+)
+
+
+def test_chunks_cover_every_sentence_in_order():
+    chunker = TextChunker(count_tokens, max_tokens=40, overlap_tokens=10)
+    chunks = list(chunker.chunks(TEXT))
+    sentences = [sentence for sentence, _ in iter_sentences(TEXT)]
+    seen = []
+    for chunk in chunks:
+        for sentence in sentences:
+            if sentence in chunk and sentence not in seen:
+                seen.append(sentence)
+    assert seen == sentences
+    assert all(count_tokens(chunk) <= 40 for chunk in chunks)
+
+
+def test_overlap_repeats_trailing_sentences():
+    chunker = TextChunker(count_tokens, max_tokens=40, overlap_tokens=10)
+    chunks = list(chunker.chunks(" ".join(f"Sentence {i} has six words here." for i in range(20))))
+    assert len(chunks) > 1
+    for first, second in zip(chunks, chunks[1:]):
+        last_sentence = first.rsplit(". ", 1)[-1]
+        assert second.startswith(last_sentence)
+
+
+def test_streamed_pieces_match_whole_text():
+    chunker = TextChunker(count_tokens, max_tokens=40, overlap_tokens=10)
+    pieces = [TEXT[i:i + 7] for i in range(0, len(TEXT), 7)]
+    assert list(chunker.chunks(iter(pieces))) == list(chunker.chunks(TEXT))
+
+
+def test_text_without_whitespace_is_hard_split():
+    chunker = TextChunker(char_tokens, max_tokens=240, overlap_tokens=40)
+    text = "x" * 20000
+    chunks = list(chunker.chunks(text))
+    assert all(char_tokens(chunk) <= 240 for chunk in chunks)
+    assert "".join(chunks) == text
+    assert max(len(sentence) for sentence, _ in iter_sentences(text)) <= 8192
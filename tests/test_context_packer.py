@@ -0,0 +1,59 @@
+"""
+Unit tests for merging, deduplicating and budgeting retrieved chunks
+"""
+from backend.services.context_packer import ContextPacker, _overlap_length
+
+
+def source(name, chunk, text, distance=0.5):
+    return {"source": name, "chunk": chunk, "text": text, "distance": distance}
+
+
+def test_overlap_length_finds_short_overlaps():
+    assert _overlap_length("Alpha beta. Eta theta iota.", "Eta theta iota. Kappa lambda.") == len("Eta theta iota.")
+    long_tail = "word " * 20
+    assert _overlap_length("Start. " + long_tail, long_tail + "end.") == len(long_tail)
+    assert _overlap_length("abc.", ".def") == 0
+
+
+def test_adjacent_chunks_merge_without_duplicating_overlap():
+    packer = ContextPacker(token_budget=1000)
+    packed = packer.pack([
+        source("a.txt", 0, "Alpha beta gamma. Eta theta iota.", 0.2),
+        source("a.txt", 1, "Eta theta iota. Kappa lambda mu.", 0.1),
+    ])
+    assert len(packed) == 1
+    assert packed[0]["text"] == "Alpha beta gamma. Eta theta iota. Kappa lambda mu."
+    assert packed[0]["distance"] == 0.1
+
+
+def test_neighbours_without_overlap_join_on_a_new_line():
+    packed = ContextPacker(token_budget=1000).pack([
+        source("a.txt", 3, "First part here."),
+        source("a.txt", 4, "Second part there."),
+    ])
+    assert [item["text"] for item in packed] == ["First part here.\nSecond part there."]
+
+
+def test_keeps_retrieval_order():
+    packed = ContextPacker(token_budget=1000).pack([
+        source("lexical.txt", 0, "Only the keyword search found this one.", None),
+        source("dense.txt", 0, "The closest embedding match is here.", 0.1),
+    ])
+    assert [item["source"] for item in packed] == ["lexical.txt", "dense.txt"]
+
+
+def test_oversized_chunk_is_skipped_not_final():
+    packed = ContextPacker(token_budget=30).pack([
+        source("a.txt", 0, "Short first chunk."),
+        source("b.txt", 0, "A much longer chunk " * 10),
+        source("c.txt", 0, "Small one fits."),
+    ])
+    assert [item["source"] for item in packed] == ["a.txt", "c.txt"]
+
+
+def test_near_duplicates_are_dropped():
+    packed = ContextPacker(token_budget=1000).pack([
+        source("a.txt", 0, "Schools must enroll homeless students immediately."),
+        source("b.txt", 7, "Schools must enroll homeless students immediately!"),
+    ])
+    assert [item["source"] for item in packed] == ["a.txt"]
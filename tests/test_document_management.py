@@ -0,0 +1,86 @@
+"""
+Unit tests for listing, deleting and replacing single sources
+"""
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routes import api
+from backend.services.ingest_jobs import IngestJobManager, IngestJobStore
+
+
+@pytest.fixture
+def rag(make_rag, monkeypatch):
+    monkeypatch.setenv("CHUNK_TOKENS", "8")
+    monkeypatch.setenv("CHUNK_OVERLAP_TOKENS", "0")
+    monkeypatch.setenv("INGEST_WRITE_BATCH_SIZE", "2")
+    rag = make_rag()
+    rag.add_documents([
+        ("Plants make food from light. Roots take up water and minerals.", "guides/plants.txt"),
+        ("A volcano erupts lava and ash.", "volcano.txt"),
+    ])
+    return rag
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, rag):
+    jobs = IngestJobManager(rag, IngestJobStore(str(tmp_path / "ingest_jobs.db")), str(tmp_path / "uploads"))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        jobs.start()
+        yield
+        await jobs.aclose()
+
+    monkeypatch.setattr(api.services, "rag", rag)
+    monkeypatch.setattr(api.services, "jobs", jobs)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_sources_are_listed_across_pages(rag):
+    assert rag.list_sources() == [{"source": "guides/plants.txt", "chunks": 2}, {"source": "volcano.txt", "chunks": 1}]
+
+
+def test_deleting_a_source_leaves_the_others(rag):
+    assert rag.query("volcano lava", n_results=1)[0]["source"] == "volcano.txt"
+    assert rag.delete_source("volcano.txt") == 1
+    assert rag.delete_source("volcano.txt") == 0
+    assert [item["source"] for item in rag.list_sources()] == ["guides/plants.txt"]
+    assert all(source["source"] != "volcano.txt" for source in rag.query("volcano lava", n_results=3))
+    assert rag.lexical_index.search("volcano") == []
+
+
+def test_delete_and_list_endpoints(client):
+    assert client.get("/api/documents").json()["total_chunks"] == 3
+    response = client.delete("/api/documents/guides/plants.txt")
+    assert response.status_code == 200 and response.json()["chunks_removed"] == 2
+    assert client.delete("/api/documents/guides/plants.txt").status_code == 404
+    assert client.get("/api/documents").json() == {"sources": [{"source": "volcano.txt", "chunks": 1}], "total_chunks": 1}
+
+
+def test_replacing_a_source_reembeds_only_changed_chunks(client, rag):
+    response = client.put(
+        "/api/documents/guides/plants.txt",
+        files={"file": ("upload.txt", b"Plants make food from light. Stems carry water to the leaves.", "text/plain")},
+    )
+    assert response.status_code == 202 and response.json()["filename"] == "guides/plants.txt"
+    job_id = response.json()["job_id"]
+    for _ in range(200):
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.02)
+    assert job["status"] == "done" and job["chunks_created"] == 1
+    assert rag.query("stems carry water", n_results=1)[0]["text"] == "Stems carry water to the leaves."
+    assert {item["source"]: item["chunks"] for item in rag.list_sources()}["guides/plants.txt"] == 2
+
+
+def test_replacement_must_be_a_supported_type(client):
+    response = client.put("/api/documents/notes", files={"file": ("notes.docx", b"x", "text/plain")})
+    assert response.status_code == 400
@@ -0,0 +1,67 @@
+"""
+Unit tests for BM25 lexical search and its reciprocal rank fusion with dense results
+"""
+import pytest
+
+from backend.services.lexical_index import BM25Index, tokenize
+
+
+def test_tokenize_keeps_hyphenated_terms_and_their_parts():
+    assert tokenize("The McKinney-Vento Act, 1987!") == ["the", "mckinney-vento", "mckinney", "vento", "act", "1987"]
+
+
+def test_rare_terms_and_short_documents_rank_first():
+    index = BM25Index()
+    index.add(["a", "b", "c"], [
+        "school lunch program",
+        "school bus schedule and school lunch menu for the whole district",
+        "school calendar",
+    ])
+    assert [doc_id for doc_id, _ in index.search("lunch")] == ["a", "b"]
+    assert index.search("calendar")[0][0] == "c"
+    assert index.search("unknown words") == []
+
+
+def test_readding_an_id_replaces_its_text():
+    index = BM25Index()
+    index.add(["a"], ["volcano"])
+    index.add(["a"], ["glacier"])
+    assert index.search("volcano") == []
+    index.remove(["a"])
+    assert len(index) == 0 and index.search("glacier") == []
+
+
+def test_saved_index_is_reloaded_by_other_readers(tmp_path):
+    writer = BM25Index(tmp_path / "docs.bm25.json")
+    writer.add(["a"], ["volcano"])
+    writer.save()
+    reader = BM25Index(tmp_path / "docs.bm25.json")
+    assert reader.search("volcano")[0][0] == "a"
+    writer.add(["b"], ["glacier"])
+    writer.save()
+    assert reader.search("glacier")[0][0] == "b"
+
+
+def test_reciprocal_rank_fusion_rewards_agreement(rag):
+    fused = rag._reciprocal_rank_fusion([["a", "b", "c"], ["c", "b"]])
+    assert fused == ["c", "b", "a"]
+
+
+def test_lexical_only_hits_are_fused_with_a_dense_distance(make_rag, monkeypatch):
+    monkeypatch.setenv("HYBRID_CANDIDATES", "1")
+    rag = make_rag()
+    rag.add_documents([("eruption? yes", "x.txt"), ("the volcano eruption", "y.txt")])
+    # The dense model sees "eruption?" as its own word; BM25 strips the "?"
+    sources = rag.query("volcano eruption?", n_results=2)
+    assert [source["source"] for source in sources] == ["x.txt", "y.txt"]
+    assert sources[1]["distance"] == pytest.approx(2 - 2 / (3 ** 0.5 * 2 ** 0.5), abs=1e-5)
+
+
+def test_lexical_index_is_rebuilt_when_missing(make_rag):
+    rag = make_rag()
+    rag.add_document("Lava flows from the volcano.", "volcano.txt")
+    for path in rag.index_directory.glob("*.bm25.json"):
+        path.unlink()
+    reopened = make_rag()
+    assert reopened.query("lava", n_results=1)[0]["source"] == "volcano.txt"
+    assert any(rag.index_directory.glob("*.bm25.json"))
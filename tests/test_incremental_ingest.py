@@ -0,0 +1,86 @@
+"""
+Unit tests for content-hash ingestion: unchanged documents are skipped, changed ones re-embed only new chunks
+"""
+import pytest
+
+SENTENCES = [
+    "Plants make food from light.",
+    "Roots take up water and minerals.",
+    "Leaves are green because of chlorophyll.",
+]
+
+
+@pytest.fixture
+def rag(make_rag, monkeypatch):
+    monkeypatch.setenv("CHUNK_TOKENS", "8")
+    monkeypatch.setenv("CHUNK_OVERLAP_TOKENS", "0")
+    return make_rag()
+
+
+def chunks_of(rag, source):
+    found = rag.collection.get(where={"source": source}, include=["documents", "metadatas"])
+    return dict(zip(found["ids"], found["documents"]))
+
+
+def test_unchanged_document_is_skipped(rag, model):
+    first = rag.upsert_document(" ".join(SENTENCES), "plants.txt")
+    assert first.chunks == first.chunks_written == 3
+    encoded = model.encoded
+    again = rag.upsert_document(" ".join(SENTENCES), "plants.txt")
+    assert again.unchanged and again.chunks == 3 and again.chunks_written == 0
+    assert model.encoded == encoded
+
+
+def test_changed_document_embeds_only_new_chunks(rag, model):
+    rag.upsert_document(" ".join(SENTENCES), "plants.txt")
+    before = chunks_of(rag, "plants.txt")
+    encoded = model.encoded
+    edited = [SENTENCES[0], "Stems carry water to the leaves.", SENTENCES[2]]
+    result = rag.upsert_document(" ".join(edited), "plants.txt")
+    assert (result.chunks, result.chunks_written, result.chunks_removed) == (3, 1, 1)
+    assert model.encoded == encoded + 1
+
+    after = chunks_of(rag, "plants.txt")
+    assert len(set(before) & set(after)) == 2
+    assert sorted(after.values()) == sorted(edited)
+    metadatas = rag.collection.get(where={"source": "plants.txt"}, include=["metadatas"])["metadatas"]
+    assert {meta["source_hash"] for meta in metadatas} == {rag._hash(" ".join(edited))}
+    assert sorted(meta["chunk"] for meta in metadatas) == [0, 1, 2]
+    assert rag.query("stems carry water", n_results=1)[0]["text"] == edited[1]
+
+
+def test_chunk_ids_are_deterministic_per_source(rag):
+    rag.upsert_document(" ".join(SENTENCES), "plants.txt")
+    rag.upsert_document(" ".join(SENTENCES), "copy.txt")
+    ids = set(chunks_of(rag, "plants.txt"))
+    assert ids.isdisjoint(chunks_of(rag, "copy.txt"))
+    rag.clear_collection()
+    rag.upsert_document(" ".join(SENTENCES), "plants.txt")
+    assert set(chunks_of(rag, "plants.txt")) == ids
+
+
+def test_repeated_chunks_keep_separate_ids(rag):
+    text = " ".join([SENTENCES[0], SENTENCES[1], SENTENCES[0]])
+    assert rag.upsert_document(text, "plants.txt").chunks_written == 3
+    assert len(chunks_of(rag, "plants.txt")) == 3
+
+
+def test_bulk_ingest_skips_unchanged_sources(rag, model):
+    rag.add_documents([(SENTENCES[0], "a.txt"), (SENTENCES[1], "b.txt")])
+    encoded = model.encoded
+    results = rag.add_documents([(SENTENCES[0], "a.txt"), (SENTENCES[2], "b.txt")])
+    assert [result.unchanged for result in results] == [True, False]
+    assert model.encoded == encoded + 1
+    assert list(chunks_of(rag, "b.txt").values()) == [SENTENCES[2]]
+
+
+def test_unchanged_file_is_skipped_before_extraction(rag, tmp_path, model):
+    path = tmp_path / "plants.txt"
+    path.write_text(" ".join(SENTENCES), encoding="utf-8")
+    assert rag.ingest_file(str(path), "txt", "plants.txt").chunks_written == 3
+    encoded = model.encoded
+    assert rag.ingest_file(str(path), "txt", "plants.txt").unchanged
+    path.write_text(" ".join(SENTENCES[:2]), encoding="utf-8")
+    result = rag.ingest_file(str(path), "txt", "plants.txt")
+    assert (result.chunks_written, result.chunks_removed) == (0, 1)
+    assert model.encoded == encoded
@@ -0,0 +1,70 @@
+"""
+Unit tests for blue/green index rebuilds behind the collection alias
+"""
+import json
+
+import pytest
+
+
+def versions(rag):
+    return sorted(getattr(collection, "name", collection) for collection in rag.client.list_collections())
+
+
+@pytest.fixture
+def rag(make_rag):
+    rag = make_rag()
+    rag.add_document("A volcano erupts lava and ash.", "volcano.txt")
+    return rag
+
+
+def test_queries_read_the_old_version_until_the_switch(rag):
+    with rag.rebuild() as shadow:
+        rag.add_document("Glaciers carve valleys from ice.", "glacier.txt")
+        assert shadow.collection.count() == 1
+        assert rag.index_stats() == {"alias": "documents", "active": "documents", "building": shadow.name}
+        assert [source["source"] for source in rag.query("glacier ice valleys", n_results=3)] == ["volcano.txt"]
+    assert rag.index_stats()["active"] == "documents__v1"
+    assert [source["source"] for source in rag.query("glacier ice valleys", n_results=3)] == ["glacier.txt"]
+    assert json.loads(rag.alias_path.read_text())["collection"] == "documents__v1"
+
+
+def test_failed_rebuild_drops_the_shadow(rag):
+    with pytest.raises(RuntimeError, match="boom"):
+        with rag.rebuild():
+            rag.add_document("Glaciers carve valleys from ice.", "glacier.txt")
+            raise RuntimeError("boom")
+    assert rag.index_stats()["active"] == "documents"
+    assert versions(rag) == ["documents"]
+    assert not any(rag.index_directory.glob("documents__v1*"))
+    assert rag.get_document_count() == 1
+
+
+def test_only_one_rebuild_at_a_time(rag):
+    with rag.rebuild():
+        with pytest.raises(RuntimeError, match="already in progress"):
+            with rag.rebuild():
+                pass
+
+
+def test_other_services_follow_the_switch(make_rag, rag):
+    reader = make_rag()
+    assert reader.query("volcano lava", n_results=1)[0]["source"] == "volcano.txt"
+    with rag.rebuild():
+        rag.add_document("Glaciers carve valleys from ice.", "glacier.txt")
+    assert reader.query("volcano lava", n_results=3)[0]["source"] == "glacier.txt"
+    assert reader.index_stats()["active"] == "documents__v1"
+
+
+def test_old_versions_beyond_the_limit_are_deleted(rag):
+    for _ in range(3):
+        with rag.rebuild():
+            rag.add_document("A volcano erupts lava and ash.", "volcano.txt")
+    assert versions(rag) == ["documents__v2", "documents__v3"]
+    assert rag.get_document_count() == 1
+
+
+def test_clear_switches_to_an_empty_version(rag):
+    rag.clear_collection()
+    assert rag.get_document_count() == 0
+    assert rag.index_stats()["active"] == "documents__v1"
+    assert versions(rag) == ["documents", "documents__v1"]
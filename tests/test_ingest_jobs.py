@@ -0,0 +1,120 @@
+"""
+Unit tests for background ingestion jobs, their SQLite store and the upload/job status API
+"""
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routes import api
+from backend.services.ingest_jobs import IngestJobManager, IngestJobStore, JobProgress
+
+TEXT = b"Plants make food from light. Roots take up water and minerals."
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IngestJobStore(str(tmp_path / "ingest_jobs.db"))
+    yield store
+    store.close()
+
+
+def test_job_lifecycle_is_visible_to_other_connections(store):
+    job = store.create("plants.txt", "txt")
+    assert job["status"] == "queued" and job["pages_done"] == 0
+    store.update(job["job_id"], status="done", result="success", chunks_created=2)
+    other = IngestJobStore(store.path)
+    assert other.get(job["job_id"])["chunks_created"] == 2
+    assert other.counts() == {"done": 1}
+    assert other.get("missing") is None
+    other.close()
+
+
+def test_unknown_fields_are_rejected(store):
+    job = store.create("plants.txt", "txt")
+    with pytest.raises(ValueError):
+        store.update(job["job_id"], owner="me")
+
+
+def test_old_finished_jobs_are_pruned(tmp_path):
+    store = IngestJobStore(str(tmp_path / "ingest_jobs.db"), ttl=0.05)
+    finished = store.create("old.txt", "txt")
+    store.update(finished["job_id"], status="failed")
+    running = store.create("slow.txt", "txt")
+    store.update(running["job_id"], status="running")
+    time.sleep(0.06)
+    store.create("new.txt", "txt")
+    assert store.get(finished["job_id"]) is None
+    assert store.get(running["job_id"]) is not None
+    store.close()
+
+
+def test_progress_callback_records_pages_and_chunks(store):
+    job = store.create("book.pdf", "pdf")
+    progress = JobProgress(store.path, job["job_id"])
+    progress("pages", 3, 10)
+    progress("chunks", 12, None)
+    job = store.get(job["job_id"])
+    assert (job["pages_done"], job["pages_total"], job["chunks_done"], job["chunks_total"]) == (3, 10, 12, None)
+    with pytest.raises(ValueError):
+        progress("tokens", 1, 1)
+
+
+def make_client(monkeypatch, jobs, start=True):
+    @asynccontextmanager
+    async def lifespan(app):
+        if start:
+            jobs.start()
+        yield
+        await jobs.aclose()
+
+    monkeypatch.setattr(api.services, "jobs", jobs)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api.router, prefix="/api")
+    return TestClient(app)
+
+
+def wait_for(client, job_id):
+    for _ in range(200):
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_uploads_are_ingested_in_the_background(monkeypatch, tmp_path, rag):
+    jobs = IngestJobManager(rag, IngestJobStore(str(tmp_path / "ingest_jobs.db")), str(tmp_path / "uploads"))
+    with make_client(monkeypatch, jobs) as client:
+        response = client.post("/api/upload", files={"file": ("plants.txt", TEXT, "text/plain")})
+        assert response.status_code == 202
+        job = wait_for(client, response.json()["job_id"])
+        assert job["status"] == "done" and job["result"] == "success"
+        assert job["chunks_created"] == job["chunks_done"] > 0
+
+        again = client.post("/api/upload", files={"file": ("plants.txt", TEXT, "text/plain")}).json()
+        assert wait_for(client, again["job_id"])["result"] == "unchanged"
+
+        assert client.post("/api/upload", files={"file": ("notes.docx", b"x", "text/plain")}).status_code == 400
+        assert client.get("/api/jobs/missing").status_code == 404
+    assert rag.get_document_count() == job["chunks_created"]
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_full_queue_returns_429(monkeypatch, tmp_path, rag):
+    jobs = IngestJobManager(
+        rag, IngestJobStore(str(tmp_path / "ingest_jobs.db")), str(tmp_path / "uploads"), max_pending=1
+    )
+    with make_client(monkeypatch, jobs, start=False) as client:
+        first = client.post("/api/upload", files={"file": ("a.txt", TEXT, "text/plain")})
+        assert first.status_code == 202
+        second = client.post("/api/upload", files={"file": ("b.txt", TEXT, "text/plain")})
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+    # Shutting down fails the job that never ran and removes its spool file
+    reopened = IngestJobStore(jobs.store.path)
+    assert reopened.get(first.json()["job_id"])["status"] == "failed"
+    reopened.close()
+    assert list((tmp_path / "uploads").iterdir()) == []
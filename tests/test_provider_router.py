@@ -0,0 +1,96 @@
+"""
+Unit tests for provider ordering and circuit breaker transitions
+"""
+import pytest
+
+from backend.services import provider_router
+from backend.services.provider_router import ProviderRouter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(provider_router.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_router(**kwargs):
+    return ProviderRouter(["xai", "openai"], failure_threshold=2, cooldown=30.0, **kwargs)
+
+
+def state(router, provider):
+    return router.stats()["providers"][provider]["state"]
+
+
+def test_preferred_provider_first_then_fastest():
+    router = ProviderRouter(["xai", "openai", "other"])
+    router.record("openai", 0.5, ok=True)
+    router.record("other", 0.1, ok=True)
+    assert router.candidates("xai") == (["xai", "other", "openai"], set())
+    assert make_router(failover=False).candidates("openai") == (["openai"], set())
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    router = make_router()
+    router.record("xai", 1.0, ok=False)
+    assert state(router, "xai") == "closed"
+    router.record("xai", 1.0, ok=False)
+    assert state(router, "xai") == "open"
+    assert router.candidates("xai") == (["openai"], set())
+
+
+def test_success_resets_the_failure_count(clock):
+    router = make_router()
+    router.record("xai", 1.0, ok=False)
+    router.record("xai", 1.0, ok=True)
+    router.record("xai", 1.0, ok=False)
+    assert state(router, "xai") == "closed"
+
+
+def test_half_open_allows_a_single_trial(clock):
+    router = make_router()
+    for _ in range(2):
+        router.record("xai", 1.0, ok=False)
+    clock[0] += 30.0
+    assert state(router, "xai") == "half_open"
+
+    assert router.candidates("xai") == (["xai", "openai"], {"xai"})
+    # The trial is taken: concurrent requests skip the provider
+    assert router.candidates("xai") == (["openai"], set())
+
+    router.release("xai")
+    assert router.candidates("xai") == (["xai", "openai"], {"xai"})
+
+
+def test_trial_outcome_closes_or_reopens(clock):
+    router = make_router()
+    for _ in range(2):
+        router.record("xai", 1.0, ok=False)
+    clock[0] += 30.0
+    router.candidates("xai")
+    router.record("xai", 1.0, ok=False)
+    assert state(router, "xai") == "open"
+
+    clock[0] += 30.0
+    router.candidates("xai")
+    router.record("xai", 0.2, ok=True)
+    assert state(router, "xai") == "closed"
+    assert router.candidates("xai") == (["xai", "openai"], set())
+
+
+def test_every_breaker_open_leaves_no_candidates(clock):
+    router = make_router()
+    for provider in ("xai", "openai"):
+        for _ in range(2):
+            router.record(provider, 1.0, ok=False)
+    assert router.candidates("xai") == ([], set())
+
+
+def test_hedge_delay_needs_enough_samples():
+    router = make_router(hedge=True, hedge_min_samples=3)
+    router.record("xai", 0.2, ok=True)
+    assert router.hedge_delay("xai") is None
+    for _ in range(2):
+        router.record("xai", 0.2, ok=True)
+    assert router.hedge_delay("xai") == pytest.approx(0.2)
+    assert make_router().hedge_delay("xai") is None
@@ -0,0 +1,64 @@
+"""
+Unit tests for the TTL/LRU cache and RAGService's query embedding and result caches
+"""
+import time
+
+from backend.services.cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a", "gone") == "gone"
+    assert len(cache) == 0
+
+
+def test_sliding_ttl_is_extended_by_hits():
+    cache = TTLCache(maxsize=4, ttl=0.2, sliding=True)
+    cache.set("a", 1)
+    for _ in range(3):
+        time.sleep(0.1)
+        assert cache.get("a") == 1
+
+
+def test_zero_maxsize_disables_the_cache():
+    cache = TTLCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_query_variants_share_one_embedding(rag, model):
+    rag.add_document("Plants make food from light. Roots take up water.", "plants.txt")
+    encoded = model.encoded
+    rag.query("How do plants make food?")
+    rag.query("  how do PLANTS make   food? ")
+    assert model.encoded == encoded + 1
+    assert rag.cache_stats()["results"]["hits"] == 1
+
+
+def test_writes_invalidate_cached_results(rag):
+    rag.add_document("Plants make food from light.", "plants.txt")
+    assert [s["source"] for s in rag.query("volcano lava", n_results=5)] == ["plants.txt"]
+    rag.add_document("A volcano erupts lava and ash.", "volcano.txt")
+    assert rag.query("volcano lava", n_results=5)[0]["source"] == "volcano.txt"
+
+
+def test_writes_from_another_service_invalidate_cached_results(make_rag):
+    reader, writer = make_rag(), make_rag()
+    writer.add_document("Plants make food from light.", "plants.txt")
+    assert len(reader.query("volcano lava", n_results=5)) == 1
+    writer.add_document("A volcano erupts lava and ash.", "volcano.txt")
+    assert reader.query("volcano lava", n_results=5)[0]["source"] == "volcano.txt"
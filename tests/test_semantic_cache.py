@@ -0,0 +1,65 @@
+"""
+Unit tests for the semantic answer cache
+"""
+import time
+
+from backend.services.semantic_cache import SemanticCache, source_set_key
+
+SOURCES = [{"source": "plants.txt", "chunk": 0, "text": "Plants make food from light."}]
+
+
+def test_close_queries_hit_and_distant_ones_miss():
+    cache = SemanticCache(threshold=0.9)
+    cache.store([1.0, 0.0, 0.0], "en", "5", SOURCES, "Photosynthesis.", "xai")
+    assert cache.lookup([0.99, 0.05, 0.0], "en", "5", SOURCES) == ("Photosynthesis.", "xai")
+    assert cache.lookup([0.0, 1.0, 0.0], "en", "5", SOURCES) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_language_grade_and_sources_partition_the_cache():
+    cache = SemanticCache(threshold=0.9)
+    cache.store([1.0, 0.0], "en", "5", SOURCES, "answer", "xai")
+    assert cache.lookup([1.0, 0.0], "es", "5", SOURCES) is None
+    assert cache.lookup([1.0, 0.0], "en", "8", SOURCES) is None
+    assert cache.lookup([1.0, 0.0], "en", "5", []) is None
+
+
+def test_source_key_ignores_order_but_not_text():
+    other = {"source": "rocks.txt", "chunk": 2, "text": "Rocks."}
+    assert source_set_key(SOURCES + [other]) == source_set_key([other] + SOURCES)
+    edited = [dict(SOURCES[0], text="Plants make food from sunlight.")]
+    assert source_set_key(edited) != source_set_key(SOURCES)
+
+
+def test_expired_entries_are_not_served():
+    cache = SemanticCache(threshold=0.9, ttl=0.05)
+    cache.store([1.0, 0.0], "en", "5", SOURCES, "answer", "xai")
+    time.sleep(0.06)
+    assert cache.lookup([1.0, 0.0], "en", "5", SOURCES) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(threshold=0.9, maxsize=2)
+    cache.store([1.0, 0.0, 0.0], "en", "5", SOURCES, "x", "xai")
+    cache.store([0.0, 1.0, 0.0], "en", "5", SOURCES, "y", "xai")
+    time.sleep(0.01)
+    assert cache.lookup([1.0, 0.0, 0.0], "en", "5", SOURCES) == ("x", "xai")
+    cache.store([0.0, 0.0, 1.0], "en", "5", SOURCES, "z", "xai")
+    assert cache.lookup([0.0, 1.0, 0.0], "en", "5", SOURCES) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = tmp_path / "semantic_cache.db"
+    cache = SemanticCache(threshold=0.9, path=str(path))
+    cache.store([1.0, 0.0], "en", "5", SOURCES, "answer", "xai")
+    cache.close()
+    reopened = SemanticCache(threshold=0.9, path=str(path))
+    assert reopened.lookup([1.0, 0.0], "en", "5", SOURCES) == ("answer", "xai")
+    reopened.close()
+
+
+def test_disabled_unless_enabled_in_env():
+    assert SemanticCache.from_env({}) is None
+    cache = SemanticCache.from_env({"SEMANTIC_CACHE_ENABLED": "true", "SEMANTIC_CACHE_THRESHOLD": "0.8"})
+    assert cache.threshold == 0.8
@@ -0,0 +1,80 @@
+"""
+Unit tests for the in-memory and SQLite session stores
+"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from backend.services.session_store import MemorySessionStore, SQLiteSessionStore, create_session_store
+
+PROFILE = {"language": "en", "grade_level": "5"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = create_session_store({"SESSION_STORE": request.param, "SESSION_DB_PATH": str(tmp_path / "sessions.db")})
+    yield store
+    store.close()
+
+
+def test_profiles_round_trip(store):
+    store.set("s1", PROFILE)
+    assert store.get("s1") == PROFILE
+    assert store.get("unknown") is None
+    assert store.get(None) is None
+    store.delete("s1")
+    assert store.get("s1") is None
+
+
+def test_async_accessors(store):
+    async def scenario():
+        await store.aset("s1", PROFILE)
+        return await store.aget("s1")
+
+    assert asyncio.run(scenario()) == PROFILE
+
+
+def test_idle_sessions_expire(tmp_path):
+    for store in (MemorySessionStore(ttl=0.05), SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=0.05)):
+        store.set("s1", PROFILE)
+        time.sleep(0.06)
+        assert store.get("s1") is None
+        store.close()
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    first.set("s1", PROFILE)
+    assert second.get("s1") == PROFILE
+    with sqlite3.connect(path) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    first.close()
+    second.close()
+
+
+def test_sqlite_reads_touch_only_idle_sessions(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), touch_interval=60)
+    store.set("s1", PROFILE)
+    seen = store._db.execute("SELECT last_seen FROM sessions").fetchone()[0]
+    store.get("s1")
+    assert store._db.execute("SELECT last_seen FROM sessions").fetchone()[0] == seen
+    store.close()
+
+
+def test_sqlite_prunes_least_recently_seen_beyond_maxsize(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), maxsize=2, prune_every=1)
+    for session_id in ("s1", "s2", "s3"):
+        store.set(session_id, PROFILE)
+        time.sleep(0.001)
+    assert store.get("s1") is None
+    assert store.get("s3") == PROFILE
+    assert store.stats()["size"] == 2 and store.stats()["evictions"] == 1
+    store.close()
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_session_store({"SESSION_STORE": "redis"})
@@ -0,0 +1,46 @@
+"""
+Unit tests for incremental HTML formatting of streamed model output
+"""
+from backend.services.chat_service import StreamingHTMLFormatter
+
+
+def stream(text, size, markdown=None):
+    formatter = StreamingHTMLFormatter(markdown=markdown)
+    pieces = [formatter.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return "".join(pieces) + formatter.flush()
+
+
+MARKDOWN = "## Photosynthesis\nPlants use **light** to make food.\n- water\n- carbon dioxide\n\nThat is all."
+
+
+def test_markdown_becomes_paragraphs_and_lists():
+    html = stream(MARKDOWN, len(MARKDOWN))
+    assert html == (
+        "<strong>Photosynthesis</strong>\n"
+        "<p>Plants use <strong>light</strong> to make food.</p>\n"
+        "<ul>\n<li>water</li>\n<li>carbon dioxide</li>\n</ul>\n"
+        "<p>That is all.</p>\n"
+    )
+
+
+def test_output_does_not_depend_on_chunk_size():
+    whole = stream(MARKDOWN, len(MARKDOWN))
+    for size in (1, 3, 7):
+        assert stream(MARKDOWN, size) == whole
+
+
+def test_nothing_is_emitted_before_a_line_completes():
+    formatter = StreamingHTMLFormatter()
+    assert formatter.feed("Half a sent") == ""
+    assert formatter.feed("ence.\nNext") == "<p>Half a sentence.</p>\n"
+    assert formatter.flush() == "<p>Next</p>\n"
+
+
+def test_numbered_list_is_closed_on_flush():
+    assert stream("1. one\n2. two", 4) == "<ul>\n<li>one</li>\n<li>two</li>\n</ul>\n"
+
+
+def test_html_output_passes_through():
+    html = "<p>Already <strong>formatted</strong>.</p>\n<ul><li>item</li></ul>"
+    assert stream(html, 5) == html
+    assert stream("<strong>Bold</strong> start\nmore", 6) == "<strong>Bold</strong> start\nmore"
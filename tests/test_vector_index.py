@@ -0,0 +1,113 @@
+"""
+Unit tests for the memory-mapped NumpyCollection
+"""
+import json
+
+import pytest
+
+from backend.services.vector_index import MANIFEST, NumpyCollection
+
+
+def axis(i, dim=4):
+    return [1.0 if j == i else 0.0 for j in range(dim)]
+
+
+@pytest.fixture
+def collection(tmp_path):
+    collection = NumpyCollection(tmp_path, "docs")
+    collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[axis(0), axis(1), axis(2)],
+        documents=["A", "B", "C"],
+        metadatas=[{"source": "x"}, {"source": "y"}, {"source": "x"}],
+    )
+    return collection
+
+
+def test_query_returns_nearest_first(collection):
+    result = collection.query(query_embeddings=[[0.9, 0.1, 0.0, 0.0]], n_results=2)
+    assert result["ids"] == [["a", "b"]]
+    assert result["documents"] == [["A", "B"]]
+    assert result["distances"][0][0] < result["distances"][0][1]
+
+
+def test_query_with_metadata_filter(collection):
+    result = collection.query(query_embeddings=[axis(1)], n_results=3, where={"source": "x"})
+    assert sorted(result["ids"][0]) == ["a", "c"]
+
+
+def test_add_skips_existing_ids(collection):
+    collection.add(ids=["a", "d"], embeddings=[axis(3), axis(3)], documents=["A2", "D"], metadatas=[{}, {}])
+    assert collection.count() == 4
+    assert collection.get(ids=["a"])["documents"] == ["A"]
+
+
+def test_upsert_replaces_and_inserts(collection):
+    collection.upsert(ids=["a", "d"], embeddings=[axis(3), axis(0)], documents=["A2", "D"], metadatas=[{}, {}])
+    assert collection.count() == 4
+    assert collection.get(ids=["a"])["documents"] == ["A2"]
+    assert collection.query(query_embeddings=[axis(3)], n_results=1)["ids"] == [["a"]]
+
+
+def test_delete_by_id_and_filter(collection):
+    collection.delete(ids=["b"])
+    assert collection.count() == 2
+    collection.delete(where={"source": "x"})
+    assert collection.count() == 0
+    assert collection.query(query_embeddings=[axis(0)], n_results=2)["ids"] == [[]]
+
+
+def test_get_pages_with_offset_and_limit(collection):
+    assert collection.get(limit=2)["ids"] == ["a", "b"]
+    assert collection.get(limit=2, offset=2)["ids"] == ["c"]
+
+
+def test_other_readers_see_appends(tmp_path, collection):
+    reader = NumpyCollection(tmp_path, "docs")
+    collection.add(ids=["d"], embeddings=[axis(3)], documents=["D"], metadatas=[{}])
+    assert reader.count() == 4
+    assert reader.query(query_embeddings=[axis(3)], n_results=1)["ids"] == [["d"]]
+
+
+def test_appends_reuse_files_and_compaction_keeps_previous(tmp_path, collection):
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    collection.add(ids=["d"], embeddings=[axis(3)], documents=["D"], metadatas=[{}])
+    assert json.loads((tmp_path / MANIFEST).read_text())["file"] == manifest["file"]
+
+    collection.delete(ids=["a"])
+    current = json.loads((tmp_path / MANIFEST).read_text())["file"]
+    files = {path.name for path in tmp_path.iterdir()}
+    assert {f"embeddings-{manifest['file']}.f32", f"embeddings-{current}.f32"} <= files
+
+    collection.delete(ids=["b"])
+    files = {path.name for path in tmp_path.iterdir()}
+    assert f"embeddings-{manifest['file']}.f32" not in files
+    assert f"embeddings-{current}.f32" in files
+
+
+def test_dimension_mismatch_is_rejected(collection):
+    with pytest.raises(ValueError):
+        collection.add(ids=["d"], embeddings=[[1.0, 0.0]], documents=["D"], metadatas=[{}])
+
+
+def test_metadata_update_keeps_vectors_file(tmp_path, collection):
+    reader = NumpyCollection(tmp_path, "docs")
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    vectors = tmp_path / f"embeddings-{manifest['file']}.f32"
+    inode = vectors.stat().st_ino
+
+    collection.update(ids=["b", "missing"], metadatas=[{"source": "z"}, {}])
+    updated = json.loads((tmp_path / MANIFEST).read_text())
+    assert updated["file"] == manifest["file"]
+    assert vectors.stat().st_ino == inode
+    assert reader.get(where={"source": "z"})["ids"] == ["b"]
+
+    collection.add(ids=["d"], embeddings=[axis(3)], documents=["D"], metadatas=[{"source": "z"}])
+    assert sorted(reader.get(where={"source": "z"})["ids"]) == ["b", "d"]
+    assert reader.query(query_embeddings=[axis(1)], n_results=1)["ids"] == [["b"]]
+
+
+def test_update_with_embeddings_moves_vector(collection):
+    collection.update(ids=["a"], embeddings=[axis(3)])
+    assert collection.query(query_embeddings=[axis(3)], n_results=1)["ids"] == [["a"]]
+    assert collection.get(ids=["a"])["documents"] == ["A"]